@@ -0,0 +1,10 @@
+"""
+Benchmarks for the earthquake API, run from the earthquake-ml-api directory:
+
+    python -m benchmarks.load --requests 2000 --concurrency 32 --output load.json
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.compare old.json new.json
+
+Upstreams are replaced by the local stand-ins in benchmarks.stubs, so nothing
+here ever calls the real Nominatim or USGS services.
+"""
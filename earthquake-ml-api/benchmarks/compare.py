@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+# -------------------------------
+# Compare two benchmark result files
+# -------------------------------
+# Prints old vs new for every metric both files share, with the new/old ratio,
+# where for every metric lower is better except throughput. With
+# --fail-above, exits non-zero when any ratio is worse than the threshold, so
+# it can gate a CI job.
+#
+#   python -m benchmarks.compare base.json head.json --fail-above 1.15
+
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Numeric leaves of the results tree as {"a.b.c": value}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def relevant(name: str) -> bool:
+    # Sample counts and loop counts describe the run, they are not results
+    return not name.endswith((".count", ".loops")) and ".statuses." not in name and not name.startswith(("statuses", "upstream_calls"))
+
+
+def compare(old: dict, new: dict) -> list:
+    """(metric, old, new, worse-by ratio) for every shared metric; ratio > 1 means a regression."""
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    rows = []
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        if not relevant(name):
+            continue
+        before, after = old_flat[name], new_flat[name]
+        if before == 0 or after == 0:
+            continue
+        worse_by = before / after if name.split(".")[-1] in HIGHER_IS_BETTER else after / before
+        rows.append((name, before, after, worse_by))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--fail-above", type=float, help="Exit 1 if any metric is worse by more than this ratio")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old["benchmark"] != new["benchmark"]:
+        sys.exit(f"Cannot compare a '{old['benchmark']}' result with a '{new['benchmark']}' result")
+
+    print(f"{old['benchmark']}: {old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    rows = compare(old, new)
+    for name, before, after, worse_by in rows:
+        flag = "  ▲ worse" if worse_by > 1.05 else ("  ▼ better" if worse_by < 0.95 else "")
+        print(f"{name:<50} {before:>14.3f} {after:>14.3f}  x{worse_by:6.3f}{flag}")
+
+    if args.fail_above and any(worse_by > args.fail_above for *_, worse_by in rows):
+        sys.exit(1)
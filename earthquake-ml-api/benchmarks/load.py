@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.report import summarize_ms, write_results
+from benchmarks.stubs import StubServer, add_profile_arguments, load_fixtures, profiles_from_args
+
+# -------------------------------
+# /predict load driver
+# -------------------------------
+# Sends concurrent /predict traffic and reports throughput plus p50/p95/p99
+# latency, end to end and per stage (geocode, usgs_activity, scoring, ...).
+#
+# By default the app runs in this process against the stub upstreams, with
+# its lifespan (feed ingestion) started, and requests go through an ASGI
+# transport. Stage timings are then the exact samples recorded by main's
+# prediction_stage_seconds histogram. With --url, a server that is already
+# running (pointed at `python -m benchmarks.stubs`) is driven over HTTP and
+# only end-to-end latency is reported.
+#
+# The traffic repeats a bounded set of (city, depth) pairs, so the prediction
+# response cache is disabled unless --response-cache is given; otherwise
+# nearly every request would be a cache hit and the stage timings would only
+# cover the few misses. With the cache on, its hit and miss counts for the
+# run are reported next to the latencies.
+#
+#   python -m benchmarks.load --requests 2000 --concurrency 32 --output load.json
+#   python -m benchmarks.load --activity live --usgs-latency-ms 150 --usgs-error-rate 0.05
+
+
+def city_names(count: int, seed: int = 0) -> list:
+    """The recorded fixture cities first, then synthetic names (resolved by the stub)."""
+    places, _ = load_fixtures()
+    names = [places[key][0]["name"] for key in places][:count]
+    names += [f"Benchtown {i:05d}" for i in range(count - len(names))]
+    random.Random(seed).shuffle(names)
+    return names
+
+
+def build_payloads(count: int, cities: list, mode: str, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [{"city": rng.choice(cities), "depth": rng.choice([5, 10, 33, 70, 150]), "mode": mode} for _ in range(count)]
+
+
+class StageRecorder:
+    """Keeps every sample a Histogram observes, per label tuple, alongside the normal recording."""
+
+    def __init__(self, histogram):
+        self.samples = {}
+        self._observe = histogram.observe
+        histogram.observe = self.observe
+
+    def observe(self, value: float, *labels) -> None:
+        self.samples.setdefault(labels, []).append(value)
+        self._observe(value, *labels)
+
+    def reset(self) -> None:
+        self.samples.clear()
+
+
+async def drive(client, payloads: list, concurrency: int) -> tuple[list, dict, float]:
+    """
+    Closed-loop load: `concurrency` workers send the payloads back to back.
+    Returns (latencies of 2xx responses in seconds, status counts, wall time).
+    """
+    latencies, statuses = [], {}
+    cursor = iter(payloads)
+
+    async def worker():
+        for payload in cursor:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/predict", json=payload)
+                status = str(response.status_code)
+            except Exception as exc:
+                status = type(exc).__name__
+            elapsed = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+            if status.startswith("2"):
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def configure_app_environment(stub: StubServer, args, workdir: str) -> None:
+    """Environment for an in-process main.py; must run before main is imported."""
+    env = {
+        **stub.env(),
+        "GEOCODE_CACHE_PATH": os.path.join(workdir, "geocode.sqlite3"),
+        "RISK_GRID_PATH": os.path.join(workdir, "risk_grid.npy"),
+        "RISK_GRID_REFRESH_SECONDS": "0",
+        "LOG_LEVEL": "ERROR",
+        "RESPONSE_CACHE_TTL": os.environ.get("RESPONSE_CACHE_TTL", "3600") if args.response_cache else "0",
+    }
+    if not args.gazetteer:
+        env["GAZETTEER_PATH"] = os.path.join(workdir, "no-gazetteer.txt")
+    if args.activity == "live":
+        # A feed URL that 404s keeps the local store empty, so every lookup goes to the FDSN stub
+        env["USGS_FEED_URL"] = f"{stub.url}/missing-feed"
+    os.environ.update(env)
+
+
+async def run_in_process(args, payloads: list, warmup: list) -> dict:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = StubServer(feed_events=args.feed_events, **profiles_from_args(args)).start()
+        configure_app_environment(stub, args, workdir)
+        import main
+
+        recorder = StageRecorder(main.STAGE_SECONDS)
+        async with main.lifespan(main.app):
+            if args.activity == "feed":
+                # Wait for the first feed download so the run measures the steady state
+                while not main.seismic_store.is_fresh():
+                    await asyncio.sleep(0.05)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await drive(client, warmup, args.concurrency)
+                recorder.reset()
+                upstream_before = dict(stub.stats)
+                cache_before = dict(main.response_cache.stats)
+                latencies, statuses, wall = await drive(client, payloads, args.concurrency)
+                cache = {k: v - cache_before[k] for k, v in main.response_cache.stats.items()}
+
+        stub.stop()
+        stages = {labels[0]: summarize_ms(samples) for labels, samples in sorted(recorder.samples.items())}
+        upstream = {k: stub.stats[k] - upstream_before.get(k, 0) for k in stub.stats}
+        return {"latencies": latencies, "statuses": statuses, "wall": wall, "stages": stages, "upstream_calls": upstream,
+                "response_cache": cache}
+
+
+async def run_against_url(args, payloads: list, warmup: list) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        await drive(client, warmup, args.concurrency)
+        latencies, statuses, wall = await drive(client, payloads, args.concurrency)
+    return {"latencies": latencies, "statuses": statuses, "wall": wall}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load-test POST /predict against stub upstreams.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent first and left out of the results")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--cities", type=int, default=200, help="Distinct city names in the traffic")
+    parser.add_argument("--mode", choices=["formula", "ml"], default="formula")
+    parser.add_argument("--activity", choices=["feed", "live"], default="feed",
+                        help="feed: activity from the local event store; live: per-request FDSN queries")
+    parser.add_argument("--gazetteer", action="store_true", help="Keep the offline gazetteer enabled if one is configured")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Keep the prediction response cache on (in-process only; a --url server uses its own setting)")
+    parser.add_argument("--url", help="Drive an already running server instead of an in-process app")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    cities = city_names(args.cities, args.seed)
+    payloads = build_payloads(args.requests, cities, args.mode, args.seed)
+    warmup = build_payloads(args.warmup, cities, args.mode, args.seed + 1)
+    run = run_against_url if args.url else run_in_process
+    raw = asyncio.run(run(args, payloads, warmup))
+
+    results = {
+        "throughput_rps": round(len(raw["latencies"]) / raw["wall"], 1) if raw["wall"] else 0.0,
+        "wall_seconds": round(raw["wall"], 3),
+        "statuses": raw["statuses"],
+        "latency_ms": summarize_ms(raw["latencies"]),
+    }
+    if "stages" in raw:
+        results["stages_ms"] = raw["stages"]
+        results["upstream_calls"] = raw["upstream_calls"]
+        if args.response_cache:
+            results["response_cache"] = raw["response_cache"]
+    document = write_results(args.output, "load", vars(args), results)
+    print(json.dumps(document["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from benchmarks.report import write_results
+
+# -------------------------------
+# Micro-benchmarks
+# -------------------------------
+# Per-call cost of the pieces a prediction is built from: the scoring
+# formula, zone lookup, hotspot proximity, the local activity score, feature
+# building and zone-model inference, each at a few batch sizes. Every case is
+# auto-ranged by timeit and reported as the best and median time per call
+# over --repeat runs, in microseconds.
+# The hotspot cases also run against a synthetic fault catalogue of thousands
+# of densified trace points, after checking the KD-tree and the brute-force
+# fallback against an exact haversine scan of every point.
+#
+#   python -m benchmarks.micro --output micro.json
+#   python -m benchmarks.micro --filter inference
+
+
+def measure(fn, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = np.array(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+    return {"best_us": round(float(runs.min()), 3), "median_us": round(float(np.median(runs)), 3), "loops": number}
+
+
+def synthetic_fault_catalogue(path: str, rng, traces: int = 400) -> str:
+    """A GeoJSON file of random-walk fault traces, 50-800 km long."""
+    features = []
+    for i in range(traces):
+        n = int(rng.integers(2, 16))
+        lat = np.clip(rng.uniform(-60, 60) + np.cumsum(rng.normal(0, 0.5, n)), -89, 89)
+        lon = (rng.uniform(-180, 180) + np.cumsum(rng.normal(0, 0.5, n)) + 180) % 360 - 180
+        features.append({"type": "Feature", "properties": {"name": f"Fault {i}"},
+                         "geometry": {"type": "LineString", "coordinates": np.column_stack([lon, lat]).tolist()}})
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    return path
+
+
+def check_hotspot_index(index, rng, queries: int = 2000) -> None:
+    """Raise AssertionError unless both search paths match an exact haversine scan."""
+    from proximity import HotspotIndex
+    from seismic_store import haversine_km
+
+    lat, lon = rng.uniform(-90, 90, queries), rng.uniform(-180, 180, queries)
+    exact = haversine_km(lat[:, None], lon[:, None], index.latitude[None, :], index.longitude[None, :]).min(axis=1)
+    brute = HotspotIndex.__new__(HotspotIndex)
+    brute.__dict__.update(index.__dict__, _tree=None)
+    for name, candidate in (("kd-tree", index), ("brute force", brute)):
+        distance, nearest = candidate.nearest(lat, lon)
+        at_index = haversine_km(lat, lon, index.latitude[nearest], index.longitude[nearest])
+        assert np.allclose(distance, exact, rtol=0, atol=1e-6), f"{name}: nearest distances differ from haversine"
+        assert np.allclose(at_index, exact, rtol=0, atol=1e-6), f"{name}: returned index is not a nearest point"
+    print(f"hotspot index over {len(index)} points matches an exact haversine scan on {queries} queries")
+
+
+def build_cases(rng, workdir: str) -> dict:
+    """name -> zero-argument callable. Imports main, which loads the zone models."""
+    import main
+    import predict
+    from model_registry import ModelRegistry, xgboost_available
+    from proximity import HotspotIndex
+    from zones import assign_zones, get_risk_zone
+
+    cases = {}
+    for n in (1, 1000):
+        lat, lon = rng.uniform(-60, 60, n), rng.uniform(-180, 180, n)
+        depth, activity = rng.uniform(1, 300, n), rng.uniform(0, 3, n)
+        cases[f"score_rows[{n}]"] = lambda lat=lat, lon=lon, depth=depth, activity=activity: main.score_rows(lat, lon, depth, activity)
+        cases[f"hotspot_nearest_km[{n}]"] = lambda lat=lat, lon=lon: main.hotspot_index.nearest_km(lat, lon)
+
+    faults = HotspotIndex.from_geojson(synthetic_fault_catalogue(os.path.join(workdir, "faults.geojson"), rng))
+    check_hotspot_index(faults, rng)
+    brute = HotspotIndex.__new__(HotspotIndex)
+    brute.__dict__.update(faults.__dict__, _tree=None)
+    for n in (1, 1000):
+        lat, lon = rng.uniform(-60, 60, n), rng.uniform(-180, 180, n)
+        cases[f"faults{len(faults)}.kdtree[{n}]"] = lambda lat=lat, lon=lon: faults.nearest_km(lat, lon)
+        cases[f"faults{len(faults)}.brute[{n}]"] = lambda lat=lat, lon=lon: brute.nearest_km(lat, lon)
+
+    cases["get_risk_zone[1]"] = lambda: get_risk_zone(27.7, 85.3)
+    lat, lon = rng.uniform(5, 40, 10000), rng.uniform(65, 100, 10000)
+    cases["assign_zones[10000]"] = lambda: assign_zones(lat, lon)
+
+    now_ms = int(time.time() * 1000)
+    main.seismic_store.load({"features": [
+        {"id": str(i), "geometry": {"coordinates": [float(x), float(y), 10.0]},
+         "properties": {"mag": float(m), "time": now_ms - int(age)}}
+        for i, (x, y, m, age) in enumerate(zip(
+            rng.uniform(-180, 180, 10000), rng.uniform(-80, 80, 10000), rng.uniform(2, 6, 10000), rng.uniform(0, 30 * 86400e3, 10000),
+        ))
+    ]})
+    cases["activity_score[10k events]"] = lambda: main.seismic_store.activity_score(27.7, 85.3)
+
+    registry = main.model_registry
+    if registry.loaded:
+        features = registry.features
+        for n in (1, 1024):
+            depths = rng.uniform(1, 300, n)
+            cases[f"registry.feature_matrix[{n}]"] = lambda depths=depths: registry.feature_matrix(depths)
+        lat, lon, depth = rng.uniform(5, 40, 1024), rng.uniform(65, 100, 1024), rng.uniform(1, 300, 1024)
+        cases["predict.build_feature_matrix[1024]"] = lambda: predict.build_feature_matrix(lat, lon, depth, features)
+
+        evaluators = {"numpy": ModelRegistry(registry.model_dir, evaluator="numpy").load()}
+        if xgboost_available():
+            evaluators["xgboost"] = ModelRegistry(registry.model_dir, evaluator="xgboost").load()
+            evaluators["auto"] = ModelRegistry(registry.model_dir, numpy_max_rows=registry.numpy_max_rows).load()
+        zone = sorted(registry.models)[0]
+        for name, reg in evaluators.items():
+            for n in (1, 8, 64, 1024):
+                depths = rng.uniform(1, 300, n)
+                cases[f"inference.{name}[{n}]"] = lambda reg=reg, depths=depths: reg.predict(zone, depths)
+    return cases
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the prediction building blocks.")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here")
+    args = parser.parse_args()
+
+    # Importing main opens the geocoding cache; keep the benchmark's out of the shared cache directory
+    workdir = tempfile.mkdtemp(prefix="bench-micro-")
+    os.environ.setdefault("GEOCODE_CACHE_PATH", os.path.join(workdir, "geocode.sqlite3"))
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    results = {}
+    for name, fn in build_cases(np.random.default_rng(args.seed), workdir).items():
+        if args.filter in name:
+            results[name] = measure(fn, args.repeat)
+            print(f"{name:<40} best {results[name]['best_us']:>12.3f} us   median {results[name]['median_us']:>12.3f} us")
+    write_results(args.output, "micro", vars(args), results)
+    if not args.output:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
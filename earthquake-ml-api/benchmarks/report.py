@@ -0,0 +1,57 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+# -------------------------------
+# Shared result format
+# -------------------------------
+# Every benchmark writes one JSON document:
+#   {"benchmark": ..., "meta": {...}, "config": {...}, "results": {...}}
+# where "meta" identifies the commit and machine, so files from different
+# commits can be diffed with benchmarks.compare.
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def summarize_ms(samples_seconds) -> dict:
+    """Count, mean and percentiles of a list of durations, in milliseconds."""
+    values = np.asarray(samples_seconds, dtype=np.float64) * 1000
+    if values.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def write_results(path: str, benchmark: str, config: dict, results: dict) -> dict:
+    document = {"benchmark": benchmark, "meta": environment_info(), "config": config, "results": results}
+    if path:
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+    return document
@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from geocache import normalize_city
+from seismic_store import haversine_km
+
+# -------------------------------
+# Local Nominatim and USGS stand-ins
+# -------------------------------
+# One threaded HTTP server that answers the three upstream calls the API
+# makes, replaying the recorded responses in fixtures/:
+#   GET /search                  Nominatim search (known cities from the
+#                                fixture, others synthesized in the same shape)
+#   GET /fdsnws/event/1/query    FDSN event query: the recorded events within
+#                                `maxradiuskm` of the point
+#   GET /feed.geojson            the 30-day summary feed: the recorded events
+#                                repeated with jitter up to --feed-events;
+#                                with --feed-new-events N, every download
+#                                first adds N brand-new events (a live feed)
+# Each upstream has its own latency and error rate, so slow or flaky
+# upstreams can be simulated without touching the real services.
+#
+#   python -m benchmarks.stubs --port 9100 --usgs-latency-ms 120 --usgs-error-rate 0.02
+#   NOMINATIM_URL=http://127.0.0.1:9100/search \
+#   USGS_API_URL=http://127.0.0.1:9100/fdsnws/event/1/query \
+#   USGS_FEED_URL=http://127.0.0.1:9100/feed.geojson uvicorn main:app
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class UpstreamProfile:
+    """Simulated service behaviour: base latency, uniform jitter and error rate."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self) -> float:
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def load_fixtures() -> tuple[dict, dict]:
+    with open(os.path.join(FIXTURES, "nominatim_search.json"), encoding="utf-8") as f:
+        places = json.load(f)
+    with open(os.path.join(FIXTURES, "usgs_events.geojson"), encoding="utf-8") as f:
+        events = json.load(f)
+    return places, events
+
+
+def synthetic_place(city: str) -> list:
+    """A Nominatim-shaped answer with coordinates derived from the name. Names starting with 'nowhere' are not found."""
+    if city.startswith("nowhere"):
+        return []
+    digest = int(hashlib.sha1(city.encode()).hexdigest()[:12], 16)
+    lat = -50 + (digest % 10000) / 100.0
+    lon = -180 + (digest // 10000 % 36000) / 100.0
+    return [{"place_id": digest % 10**9, "lat": f"{lat:.7f}", "lon": f"{lon:.7f}", "class": "boundary",
+             "type": "administrative", "addresstype": "city", "name": city.title(), "display_name": city.title()}]
+
+
+def jittered_events(events: dict, count: int, rng, max_age_ms: float, start: int = 0) -> list:
+    """
+    `count` copies of the recorded events with jittered positions and times up
+    to `max_age_ms` old, with ids unique from `start` on.
+    """
+    base = events["features"]
+    now_ms = int(time.time() * 1000)
+    features = []
+    for i in range(start, start + count):
+        event = base[i % len(base)]
+        lon, lat, depth = event["geometry"]["coordinates"]
+        features.append({
+            "type": "Feature",
+            "properties": {**event["properties"], "time": now_ms - int(rng.uniform(0, max_age_ms))},
+            "geometry": {"type": "Point", "coordinates": [
+                float(((lon + rng.normal(0, 3) + 180) % 360) - 180), float(np.clip(lat + rng.normal(0, 3), -89, 89)), depth,
+            ]},
+            "id": f"{event['id']}-{i}",
+        })
+    return features
+
+
+def encode_feed(events: dict, features: list) -> bytes:
+    return json.dumps({"type": "FeatureCollection", "metadata": {**events["metadata"], "count": len(features)}, "features": features}).encode()
+
+
+class StubServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, nominatim: UpstreamProfile = None,
+                 usgs: UpstreamProfile = None, feed_events: int = 5000, feed_new_events: int = 0):
+        self.profiles = {"nominatim": nominatim or UpstreamProfile(), "usgs": usgs or UpstreamProfile()}
+        self.places, self.events = load_fixtures()
+        self._rng = np.random.default_rng(0)
+        self.feed_features = jittered_events(self.events, feed_events, self._rng, 30 * 86400 * 1000)
+        self.feed = encode_feed(self.events, self.feed_features)
+        self.feed_new_events = feed_new_events
+        self.stats = {"nominatim": 0, "usgs_query": 0, "usgs_feed": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables that point main.py at this server."""
+        return {
+            "NOMINATIM_URL": f"{self.url}/search",
+            "USGS_API_URL": f"{self.url}/fdsnws/event/1/query",
+            "USGS_FEED_URL": f"{self.url}/feed.geojson",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_feed_events(self, count: int = 1, features: list = None) -> list:
+        """
+        Make new events appear in the feed, as the real one grows: `features`
+        if given, else `count` jittered copies of the recorded events timed now.
+        """
+        with self._lock:
+            if features is None:
+                features = jittered_events(self.events, count, self._rng, 1000, start=len(self.feed_features))
+            self.feed_features = features + self.feed_features
+            self.feed = encode_feed(self.events, self.feed_features)
+        return features
+
+    def query_events(self, params: dict) -> bytes:
+        features = self.events["features"]
+        if "latitude" in params:
+            lat, lon = float(params["latitude"]), float(params["longitude"])
+            radius = float(params.get("maxradiuskm", 20001.6))
+            coords = np.array([f["geometry"]["coordinates"][:2] for f in features])
+            near = haversine_km(lat, lon, coords[:, 1], coords[:, 0]) <= radius
+            features = [f for f, keep in zip(features, near) if keep]
+        return json.dumps({**self.events, "metadata": {**self.events["metadata"], "count": len(features)}, "features": features}).encode()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+            disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/search":
+                    city = normalize_city(params.get("city", ""))
+                    upstream, counter = "nominatim", "nominatim"
+                    body = lambda: json.dumps(stub.places.get(city) or synthetic_place(city)).encode()
+                elif url.path == "/fdsnws/event/1/query":
+                    upstream, counter, body = "usgs", "usgs_query", lambda: stub.query_events(params)
+                elif url.path == "/feed.geojson":
+                    if stub.feed_new_events:
+                        stub.add_feed_events(stub.feed_new_events)
+                    upstream, counter, body = "usgs", "usgs_feed", lambda: stub.feed
+                else:
+                    return self._send(404, b'{"error": "not found"}')
+
+                profile = stub.profiles[upstream]
+                failed = profile.fails()
+                with stub._lock:
+                    stub.stats[counter] += 1
+                    stub.stats["errors"] += failed
+                time.sleep(profile.delay())
+                if failed:
+                    return self._send(503, b'{"error": "simulated outage"}')
+                self._send(200, body())
+
+            def _send(self, status: int, payload: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    for name in ("nominatim", "usgs"):
+        parser.add_argument(f"--{name}-latency-ms", type=float, default=0.0, help=f"Base latency of the {name} stub")
+        parser.add_argument(f"--{name}-jitter-ms", type=float, default=0.0, help="Extra uniform random latency")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--feed-events", type=int, default=5000, help="Events in the synthetic 30-day feed")
+    parser.add_argument("--feed-new-events", type=int, default=0, help="New events added to the feed before each download")
+
+
+def profiles_from_args(args) -> dict:
+    return {
+        name: UpstreamProfile(getattr(args, f"{name}_latency_ms"), getattr(args, f"{name}_jitter_ms"), getattr(args, f"{name}_error_rate"))
+        for name in ("nominatim", "usgs")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve local Nominatim/USGS stand-ins.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, feed_events=args.feed_events, feed_new_events=args.feed_new_events,
+                        **profiles_from_args(args)).start()
+    for key, value in server.env().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
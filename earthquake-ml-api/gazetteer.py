@@ -0,0 +1,109 @@
+import bisect
+import csv
+import sys
+
+import numpy as np
+
+from geocache import normalize_city
+
+# -------------------------------
+# Offline gazetteer
+# -------------------------------
+# Loads a GeoNames cities dump (cities500.txt, cities15000.txt, ... from
+# https://download.geonames.org/export/dump/) into parallel arrays: one row per
+# place, plus a sorted list of normalized names that points back into them.
+# Exact lookups and prefix searches are binary searches over that list, so
+# they take microseconds and need no network.
+#
+# Names that several places share resolve to the most populous one, which is
+# what a user typing "Hyderabad" almost always means.
+
+# Column positions in the GeoNames "geoname" table
+NAME, ASCIINAME, ALTERNATENAMES, LATITUDE, LONGITUDE, COUNTRY, POPULATION = 1, 2, 3, 4, 5, 8, 14
+
+
+class Gazetteer:
+    def __init__(self, names: list, countries: list, latitude, longitude, population, keys: list, places):
+        self.names = names            # display name per place
+        self.countries = countries    # ISO country code per place
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.population = np.asarray(population, dtype=np.int64)
+        self.keys = keys              # sorted normalized names
+        self.places = np.asarray(places, dtype=np.int32)  # keys[i] names place places[i]
+        self.stats = {"hits": 0, "misses": 0, "suggestions": 0}
+
+    @classmethod
+    def from_geonames(cls, path: str, alternate_names: bool = False, min_population: int = 0) -> "Gazetteer":
+        """
+        Build the index from a tab-separated GeoNames dump. With
+        `alternate_names`, every alternate spelling is indexed as well.
+        """
+        names, countries, lats, lons, pops = [], [], [], [], []
+        entries = set()
+        csv.field_size_limit(sys.maxsize)  # alternatenames can be very long
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                population = int(row[POPULATION] or 0)
+                if population < min_population:
+                    continue
+                place = len(names)
+                names.append(row[NAME])
+                countries.append(row[COUNTRY])
+                lats.append(float(row[LATITUDE]))
+                lons.append(float(row[LONGITUDE]))
+                pops.append(population)
+
+                spellings = {row[NAME], row[ASCIINAME]}
+                if alternate_names and row[ALTERNATENAMES]:
+                    spellings.update(row[ALTERNATENAMES].split(","))
+                entries.update((normalize_city(s), place) for s in spellings if s.strip())
+
+        # Sort by name, then most populous first, so the first hit for a name is the best one
+        ordered = sorted(entries, key=lambda e: (e[0], -pops[e[1]]))
+        return cls(names, countries, lats, lons, pops, [k for k, _ in ordered], [p for _, p in ordered])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, city: str):
+        """
+        Return (lat, lon) of the most populous place with exactly this name, or None.
+        """
+        key = normalize_city(city)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            self.stats["hits"] += 1
+            place = self.places[i]
+            return float(self.latitude[place]), float(self.longitude[place])
+        self.stats["misses"] += 1
+        return None
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        """
+        Places whose name starts with `prefix`, most populous first, one entry per place.
+        """
+        key = normalize_city(prefix)
+        if not key:
+            return []
+        self.stats["suggestions"] += 1
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\uffff", lo)
+        places = np.unique(self.places[lo:hi])
+        if len(places) > limit:
+            # Only the `limit` largest need to be fully sorted
+            places = places[np.argpartition(-self.population[places], limit)[:limit]]
+        places = places[np.argsort(-self.population[places], kind="stable")]
+        return [
+            {
+                "name": self.names[p],
+                "country": self.countries[p],
+                "latitude": float(self.latitude[p]),
+                "longitude": float(self.longitude[p]),
+                "population": int(self.population[p]),
+            }
+            for p in places
+        ]
+
+    def snapshot(self) -> dict:
+        return {"places": len(self.names), "names": len(self.keys), **self.stats}
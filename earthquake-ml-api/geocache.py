@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# Two-tier geocoding cache
+# -------------------------------
+# Tier 1 is a bounded in-process LRU, tier 2 is a SQLite file that survives
+# restarts and is shared by every uvicorn worker on the host. Entries carry an
+# absolute expiry timestamp so both tiers agree on when a value goes stale.
+# The SQLite connection is opened on first use in each process: a connection
+# inherited across fork (gunicorn --preload) must never be used by the child.
+# WAL with synchronous=NORMAL only fsyncs at checkpoints; losing the last few
+# writes on power failure just costs a few repeated geocodes.
+# The memory tier and the disk have separate locks, so a memory lookup never
+# waits behind a SQLite read, write or busy timeout.
+
+MISS = object()  # Sentinel: key not cached (a cached "not found" is None)
+
+
+def normalize_city(city: str) -> str:
+    """
+    Build the cache key for a city name: case-folded with collapsed whitespace.
+    """
+    return " ".join(city.split()).casefold()
+
+
+class GeoCache:
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1024,
+        ttl: float = 7 * 24 * 3600,
+        negative_ttl: float = 3600,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()       # memory tier and stats; never held across disk I/O
+        self._disk_lock = threading.Lock()  # the SQLite connection
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self._db = None
+        self._pid = None
+        self._inherited = []  # connections opened before a fork; kept open, never used
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection, opened on first use. Call with the disk lock held."""
+        if self._db is not None and self._pid == os.getpid():
+            return self._db
+        if self._db is not None:
+            # Closing the parent's connection in the child could release the parent's locks
+            self._inherited.append(self._db)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL NOT NULL)"
+        )
+        db.commit()
+        self._db, self._pid = db, os.getpid()
+        return db
+
+    def get(self, key: str):
+        """
+        Return (lat, lon), None for a cached negative result, or MISS.
+        Falls through to disk; async callers should use get_memory and run
+        get_disk in a thread.
+        """
+        value = self.get_memory(key)
+        return self.get_disk(key) if value is MISS else value
+
+    def get_memory(self, key: str):
+        """
+        Like get, but only consults the in-process tier. Never touches the disk.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._memory[key]
+                self.stats["expirations"] += 1
+                return MISS
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            if value is None:
+                self.stats["negative_hits"] += 1
+            return value
+
+    def get_disk(self, key: str):
+        """
+        Look the key up in SQLite (blocking) and keep a hit in memory.
+        """
+        with self._disk_lock:
+            row = self._connection().execute(
+                "SELECT lat, lon, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        with self._lock:
+            if row is None or row[2] <= time.time():
+                self.stats["misses"] += 1
+                return MISS
+            value = None if row[0] is None else (row[0], row[1])
+            self._remember(key, row[2], value)
+            self.stats["disk_hits"] += 1
+            if value is None:
+                self.stats["negative_hits"] += 1
+            return value
+
+    def put(self, key: str, value) -> None:
+        """
+        Store (lat, lon), or None to record that the city does not exist.
+        The memory tier is updated at once; the disk write blocks, so async
+        callers should run it in a thread.
+        """
+        ttl = self.negative_ttl if value is None else self.ttl
+        expires_at = time.time() + ttl
+        lat, lon = (None, None) if value is None else value
+        with self._lock:
+            self._remember(key, expires_at, value)
+        with self._disk_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO geocode (key, lat, lon, expires_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, expires_at),
+            )
+            db.commit()
+
+    def prune(self) -> int:
+        """
+        Delete expired rows from the on-disk store. Returns the number removed.
+        """
+        with self._disk_lock:
+            db = self._connection()
+            cursor = db.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+            return cursor.rowcount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "memory_entries": len(self._memory), "max_entries": self.max_entries}
+
+    def close(self) -> None:
+        with self._disk_lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
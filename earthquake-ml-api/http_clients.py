@@ -0,0 +1,142 @@
+import asyncio
+import math
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from resilience import CircuitBreaker
+
+# -------------------------------
+# Pooled upstream HTTP clients
+# -------------------------------
+# One long-lived AsyncClient per upstream keeps TCP/TLS connections alive
+# between predictions. Transient failures are retried a bounded number of
+# times with exponential backoff and full jitter. A circuit breaker per
+# upstream turns a run of failed calls into immediate CircuitOpenError
+# rejections until the upstream has had time to recover.
+# retry_after() tells callers how long to wait before the upstream can be
+# asked again, for the Retry-After header of an overload response.
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+def parse_retry_after(value: str):
+    """
+    Seconds from a Retry-After header (delta-seconds or an HTTP date), or None.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        name: str,
+        headers: dict = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        http2: bool = False,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+    ):
+        self.name = name
+        self.retries = retries
+        self.backoff = backoff
+        self.http2 = http2 and http2_available()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        GET with bounded retries on connection errors, timeouts and
+        429/502/503/504. The last response or exception is returned/raised.
+        Raises CircuitOpenError without calling out while the circuit is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name}: circuit open after repeated failures")
+        attempt = 0
+        while True:
+            self.stats["requests"] += 1
+            try:
+                response = await self.client.get(url, **kwargs)
+            except httpx.RequestError:
+                if attempt >= self.retries:
+                    self.stats["errors"] += 1
+                    self.breaker.record_failure()
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    if response.status_code >= 400:
+                        self.stats["errors"] += 1
+                    if response.status_code in RETRY_STATUS_CODES or response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    return response
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def retry_after(self, response: httpx.Response = None) -> int:
+        """
+        Whole seconds (at least 1) a client should wait before retrying: the
+        upstream's own Retry-After if `response` carries one, else the time
+        until the circuit breaker lets a call through again.
+        """
+        seconds = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+        if seconds is None:
+            seconds = self.breaker.retry_after()
+        return max(1, math.ceil(seconds))
+
+    def pool_stats(self) -> dict:
+        """
+        Request counters plus a view of the connection pool. The pool is read
+        through httpcore, so the connection fields are omitted if the transport
+        does not expose it.
+        """
+        snapshot = {"name": self.name, "http2": self.http2, **self.stats, "circuit": self.breaker.snapshot()}
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            idle = sum(1 for conn in connections if conn.is_idle())
+            snapshot.update(connections=len(connections), idle_connections=idle, active_connections=len(connections) - idle)
+        return snapshot
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
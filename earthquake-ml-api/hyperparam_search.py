@@ -0,0 +1,186 @@
+import json
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# -------------------------------
+# Parallel cross-validated hyperparameter search
+# -------------------------------
+# Candidates come from a parameter grid or from random samples of it. Every
+# (candidate, fold) pair is one task on a process pool, so a search keeps all
+# cores busy instead of fitting candidates one after another.
+# The feature matrix, the target and the fold assignment are written to .npy
+# files once; workers open them with mmap_mode='r', so every task reads the
+# same pages from the page cache instead of receiving a pickled copy. A task
+# only carries the candidate's parameters, the file paths and a fold number.
+# Each task records its wall time and the peak resident memory of its worker
+# while it ran. Each worker's estimator gets an equal share of the cores as
+# n_jobs, so the pool does not oversubscribe the machine.
+#
+# Estimators are built by a module-level factory(params, n_jobs) from the
+# calling script, which the pool pickles by reference.
+
+_shared = {}  # per-process cache of the current search: directory -> {name: memory-mapped array}
+
+
+def parameter_grid(space: dict) -> list:
+    from sklearn.model_selection import ParameterGrid
+    return list(ParameterGrid(space))
+
+
+def sample_parameters(space: dict, n_iter: int, seed: int = 42) -> list:
+    """`n_iter` distinct random candidates (all of them if the grid is smaller)."""
+    from sklearn.model_selection import ParameterSampler
+    return list(ParameterSampler(space, n_iter=n_iter, random_state=seed))
+
+
+def quantile_strata(y, bins: int = 10) -> np.ndarray:
+    """Bin a continuous target by quantiles so regression folds can be stratified."""
+    edges = np.unique(np.quantile(y, np.linspace(0, 1, bins + 1)[1:-1]))
+    return np.digitize(y, edges)
+
+
+def assign_folds(strata, n_splits: int = 5, seed: int = 42) -> np.ndarray:
+    """Fold number of every row, from a shuffled stratified k-fold split."""
+    from sklearn.model_selection import StratifiedKFold
+    folds = np.empty(len(strata), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for fold, (_, test) in enumerate(splitter.split(np.zeros(len(strata)), strata)):
+        folds[test] = fold
+    return folds
+
+
+def write_shared(directory: str, **arrays) -> str:
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    return directory
+
+
+def open_shared(directory: str) -> dict:
+    if directory not in _shared:
+        _shared.clear()  # a pool reused across searches only needs the current one's arrays
+        _shared[directory] = {
+            name[:-len(".npy")]: np.load(os.path.join(directory, name), mmap_mode="r", allow_pickle=False)
+            for name in os.listdir(directory) if name.endswith(".npy")
+        }
+    return _shared[directory]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak so far (Linux reports KiB)
+
+
+class PeakMemory:
+    """Samples this process's resident set size on a thread while active."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_bytes = self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+    def __enter__(self) -> "PeakMemory":
+        self.start_bytes = self.peak_bytes = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, _rss_bytes())
+
+
+def run_trial(factory, params: dict, directory: str, fold: int, scoring: str, n_jobs: int) -> dict:
+    """Fit on every fold but `fold` and score on `fold`. Runs in a worker process."""
+    from sklearn.metrics import get_scorer
+    shared = open_shared(directory)
+    X, y, folds = shared["X"], shared["y"], shared["folds"]
+    test = folds == fold
+
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        model = factory(params, n_jobs)
+        model.fit(X[~test], y[~test])
+        fit_seconds = time.perf_counter() - start
+        score = get_scorer(scoring)(model, X[test], y[test])
+        wall_seconds = time.perf_counter() - start
+    return {
+        "fold": fold,
+        "score": float(score),
+        "fit_seconds": round(fit_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "peak_rss_mb": round(memory.peak_bytes / 2**20, 1),
+        "rss_growth_mb": round((memory.peak_bytes - memory.start_bytes) / 2**20, 1),
+    }
+
+
+def search(factory, candidates: list, X, y, strata=None, n_splits: int = 5, scoring: str = "accuracy",
+           max_workers: int = None, seed: int = 42, pool: ProcessPoolExecutor = None, label: str = "") -> list:
+    """
+    Cross-validate every candidate and return one summary per candidate, best
+    mean score first. `strata` defaults to `y` (classification); pass
+    quantile_strata(y) for a continuous target. An existing `pool` is reused.
+    """
+    y = np.asarray(y)
+    if y.dtype == object:
+        y = y.astype(str)  # fixed-width labels can be memory-mapped, Python objects cannot
+    folds = assign_folds(y if strata is None else strata, n_splits, seed)
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(max_workers or cpus, len(candidates) * n_splits))
+    n_jobs = max(1, cpus // workers)
+    directory = write_shared(tempfile.mkdtemp(prefix="hpsearch-"), X=np.asarray(X, dtype=np.float64), y=y, folds=folds)
+    print(f"🔎 {label + ': ' if label else ''}{len(candidates)} candidate(s) x {n_splits} folds "
+          f"on {workers} process(es), {n_jobs} thread(s) each")
+
+    start = time.perf_counter()
+    own_pool = pool is None
+    pool = pool or ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            [pool.submit(run_trial, factory, params, directory, fold, scoring, n_jobs) for fold in range(n_splits)]
+            for params in candidates
+        ]
+        results = []
+        for params, trials in zip(candidates, futures):
+            trials = [f.result() for f in trials]
+            scores = np.array([t["score"] for t in trials])
+            results.append({
+                "params": params,
+                "mean_score": float(scores.mean()),
+                "std_score": float(scores.std()),
+                "fit_seconds": round(sum(t["fit_seconds"] for t in trials), 3),
+                "wall_seconds": round(sum(t["wall_seconds"] for t in trials), 3),
+                "peak_rss_mb": max(t["peak_rss_mb"] for t in trials),
+                "folds": trials,
+            })
+    finally:
+        if own_pool:
+            pool.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results.sort(key=lambda r: r["mean_score"], reverse=True)
+    elapsed = time.perf_counter() - start
+    print(f"   {elapsed:.1f}s elapsed for {sum(r['wall_seconds'] for r in results):.1f}s of trials; "
+          f"best {scoring} {results[0]['mean_score']:.4f} ± {results[0]['std_score']:.4f} with {results[0]['params']}")
+    return results
+
+
+def write_report(path: str, report: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
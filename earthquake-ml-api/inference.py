@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# -------------------------------
+# Micro-batching inference executor
+# -------------------------------
+# Requests are queued for at most `max_wait_ms` (or until `max_batch_size`
+# rows are waiting), grouped by model zone and scored with one predict call
+# per zone on a thread pool. The event loop only appends to a list and awaits
+# a future; the model never runs on it.
+# Each row carries the registry it was routed with (by default the executor's
+# current one), so swapping `registry` for a new model version never mixes
+# versions within a request: rows queued before the swap finish on the old
+# models, which are released once the last of them completes.
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        registry,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_workers: int = 2,
+        observe_batch=None,
+    ):
+        self.registry = registry
+        self.observe_batch = observe_batch  # optional callback receiving each flush size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._pending = []  # (registry, model_zone, depth, future)
+        self._timer = None
+        self._running = set()  # strong references so in-flight batch tasks are not collected
+        self.stats = {"batches": 0, "items": 0, "largest_batch": 0}
+
+    async def predict(self, model_zone: str, depth: float, registry=None) -> float:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((registry or self.registry, model_zone, depth, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def predict_many(self, model_zones, depths, registry=None) -> np.ndarray:
+        results = await asyncio.gather(*(self.predict(z, d, registry) for z, d in zip(model_zones, depths)))
+        return np.asarray(results, dtype=np.float64)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch) -> None:
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        if self.observe_batch is not None:
+            self.observe_batch(len(batch))
+
+        groups = {}
+        for registry, model_zone, depth, future in batch:
+            groups.setdefault((registry, model_zone), []).append((depth, future))
+        loop = asyncio.get_running_loop()
+
+        async def run_group(registry, model_zone, rows):
+            depths = np.array([depth for depth, _ in rows], dtype=np.float64)
+            try:
+                predictions = await loop.run_in_executor(self._pool, registry.predict, model_zone, depths)
+            except Exception as exc:
+                for _, future in rows:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            for (_, future), value in zip(rows, predictions):
+                if not future.done():
+                    future.set_result(float(value))
+
+        await asyncio.gather(*(run_group(registry, zone, rows) for (registry, zone), rows in groups.items()))
+
+    def snapshot(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": len(self._pending),
+            **self.stats,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+
+import numpy as np
+
+from proximity import to_unit_vectors
+from seismic_store import EARTH_RADIUS_KM, snapshot_from_feed
+
+# -------------------------------
+# Live event fan-out
+# -------------------------------
+# The ingestion loop downloads the USGS feed once for the whole process and
+# hands every download to the hub, which pushes the event IDs it has not seen
+# before to the subscribers whose geofence (centre + radius) contains them.
+# Geofence centres live in one array of unit vectors, so matching a poll's
+# new events against every subscriber is a single (events x subscribers) dot
+# product compared with each fence's cos(radius): thousands of subscribers
+# still cost one upstream poll and one NumPy call per poll.
+# Every subscriber has a bounded queue; a client that stops reading loses its
+# oldest events instead of holding up the others.
+# parse_download turns a raw feed download into the event store's snapshot and
+# the new events in one call, so the ingestion loop can run it in a separate
+# process: json.loads holds the GIL for the whole parse of a month-long feed,
+# so a thread would still stall the event loop.
+
+MATCH_CHUNK = 256  # events matched per dot product, bounding its memory
+
+
+def feed_event(feature: dict) -> dict:
+    """The fields pushed to clients for one GeoJSON feature."""
+    props, coords = feature["properties"], feature["geometry"]["coordinates"]
+    return {
+        "id": feature.get("id"),
+        "time": props.get("time"),
+        "latitude": coords[1],
+        "longitude": coords[0],
+        "depth_km": coords[2] if len(coords) > 2 else None,
+        "magnitude": props.get("mag"),
+        "place": props.get("place"),
+        "url": props.get("url"),
+    }
+
+
+def diff_feed(geojson: dict, seen) -> tuple[set, list]:
+    """
+    The event IDs of a feed download, and the events whose IDs are not in
+    `seen`, oldest first. With `seen` None (the first download) nothing is new.
+    """
+    features = [f for f in geojson.get("features", []) if f.get("id") is not None]
+    ids = {f["id"] for f in features}
+    if seen is None:
+        return ids, []
+    new = sorted((f for f in features if f["id"] not in seen), key=lambda f: f["properties"].get("time") or 0)
+    return ids, [feed_event(f) for f in new]
+
+
+def parse_download(content: bytes, seen) -> tuple:
+    """
+    (event store snapshot, event IDs, new events) for a raw feed download.
+    Only touches its arguments, so it can run in a worker process.
+    """
+    feed = json.loads(content)
+    ids, events = diff_feed(feed, seen)
+    return snapshot_from_feed(feed), ids, events
+
+
+class Subscription:
+    def __init__(self, slot: int, latitude: float, longitude: float, radius_km: float, min_magnitude, queue_size: int):
+        self.slot = slot
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.min_magnitude = min_magnitude
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def deliver(self, message: str) -> bool:
+        """Queue a message, dropping the oldest one if the client has fallen behind."""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+        return not dropped
+
+
+class LiveEventHub:
+    def __init__(self, queue_size: int = 100, max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._centres = np.zeros((0, 3))
+        self._cos_radius = np.zeros(0)    # 2.0 marks a free slot: no dot product reaches it
+        self._min_magnitude = np.zeros(0)
+        self._subscriptions = []          # slot -> Subscription or None
+        self._free = []
+        self._seen = None                 # event IDs of the previous download; None before the first
+        self.stats = {"polls": 0, "new_events": 0, "deliveries": 0, "dropped": 0}
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions) - len(self._free)
+
+    def subscribe(self, latitude: float, longitude: float, radius_km: float, min_magnitude: float = None) -> Subscription:
+        if self.subscribers >= self.max_subscribers:
+            raise RuntimeError(f"The live feed already has {self.max_subscribers} subscribers.")
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        subscription = Subscription(slot, latitude, longitude, radius_km, min_magnitude, self.queue_size)
+        self._subscriptions[slot] = subscription
+        self._centres[slot] = to_unit_vectors(latitude, longitude)
+        self._cos_radius[slot] = np.cos(min(radius_km / EARTH_RADIUS_KM, np.pi))
+        self._min_magnitude[slot] = -np.inf if min_magnitude is None else min_magnitude
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        slot = subscription.slot
+        if self._subscriptions[slot] is subscription:
+            self._subscriptions[slot] = None
+            self._cos_radius[slot] = 2.0
+            self._free.append(slot)
+
+    def _grow(self) -> None:
+        old = len(self._subscriptions)
+        new = max(64, old * 2)
+        self._centres = np.vstack([self._centres, np.zeros((new - old, 3))])
+        self._cos_radius = np.concatenate([self._cos_radius, np.full(new - old, 2.0)])
+        self._min_magnitude = np.concatenate([self._min_magnitude, np.zeros(new - old)])
+        self._subscriptions.extend([None] * (new - old))
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    @property
+    def seen(self):
+        """Event IDs of the previous download (None before the first), for diff_feed/parse_download."""
+        return self._seen
+
+    def record_download(self, ids: set, events: list) -> list:
+        """Remember a download diffed against `seen` and return its new events."""
+        self._seen = ids
+        self.stats["polls"] += 1
+        self.stats["new_events"] += len(events)
+        return events
+
+    def publish_feed(self, geojson: dict) -> int:
+        """
+        Push the events of a feed download that earlier downloads did not
+        contain. The first download only records what already exists.
+        Returns the number of new events.
+        """
+        events = self.record_download(*diff_feed(geojson, self._seen))
+        self.publish(events)
+        return len(events)
+
+    def publish(self, events: list) -> int:
+        """Deliver events to every subscriber whose geofence contains them. Returns the deliveries made."""
+        if not events or not self.subscribers:
+            return 0
+        delivered = 0
+        for start in range(0, len(events), MATCH_CHUNK):
+            chunk = events[start:start + MATCH_CHUNK]
+            # Serialized once per event; only the distance differs between subscribers
+            heads = [f"id: {e['id']}\nevent: earthquake\ndata: {json.dumps(e)[:-1]}, " for e in chunk]
+            for i, slot, distance_km in self.match(chunk):
+                if not self._subscriptions[slot].deliver(f'{heads[i]}"distance_km": {distance_km:.1f}}}\n\n'):
+                    self.stats["dropped"] += 1
+                delivered += 1
+        self.stats["deliveries"] += delivered
+        return delivered
+
+    def match(self, events: list) -> list:
+        """
+        (event index, subscriber slot, distance in km) for every event inside a
+        subscriber's geofence and at or above its minimum magnitude.
+        """
+        n = len(self._subscriptions)
+        points = to_unit_vectors([e["latitude"] for e in events], [e["longitude"] for e in events])
+        magnitudes = np.array([np.nan if e["magnitude"] is None else e["magnitude"] for e in events], dtype=np.float64)
+        dots = points @ self._centres[:n].T
+        inside = dots >= self._cos_radius[None, :n] - 1e-12
+        # A minimum magnitude excludes events whose magnitude is unknown (NaN)
+        inside &= (magnitudes[:, None] >= self._min_magnitude[None, :n]) | np.isneginf(self._min_magnitude[None, :n])
+        rows, slots = np.nonzero(inside)
+        distances = np.arccos(np.clip(dots[rows, slots], -1.0, 1.0)) * EARTH_RADIUS_KM
+        return list(zip(rows.tolist(), slots.tolist(), distances.tolist()))
+
+    def snapshot(self) -> dict:
+        return {"subscribers": self.subscribers, "max_subscribers": self.max_subscribers, "queue_size": self.queue_size, **self.stats}
@@ -1,15 +1,49 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, field_validator
-import math
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Literal, Optional
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import time
 import httpx
+import numpy as np
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 
+from gazetteer import Gazetteer
+from geocache import GeoCache, MISS, normalize_city
+from http_clients import CircuitOpenError, UpstreamClient
+from inference import InferenceExecutor
+from live_feed import LiveEventHub, parse_download
+from metrics import Registry
+from model_artifacts import current_version
+from model_registry import ModelRegistry
+from resilience import BackgroundTasks, StaleCache
+from response_cache import CachedResponse, ResponseCache, etag_matches
+from proximity import HOTSPOTS_PATH, HotspotIndex
+from risk_grid import RiskGrid, build_grid, write_grid
+from singleflight import SingleFlight
+from seismic_store import SeismicEventStore
+
+logging.basicConfig()
+logger = logging.getLogger("earthquake_api")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
 # -------------------------------
 # Pydantic Models for Request and Response
 # -------------------------------
 class PredictionRequest(BaseModel):
     city: str
     depth: float
+    mode: Literal["formula", "ml"] = "formula"  # "ml" uses the trained per-zone models
 
     @field_validator('depth')
     def depth_must_be_positive(cls, v):
@@ -24,6 +58,413 @@ class PredictionResponse(BaseModel):
     longitude: float
     predicted_magnitude: float
     predicted_risk: str
+    prediction_mode: str = "formula"
+    risk_zone: Optional[str] = None
+    model_zone: Optional[str] = None
+    # Where the activity score came from: "fresh", "stale" (last known value) or "fallback" (none available)
+    activity_source: Optional[str] = None
+
+
+class BatchPredictionItem(BaseModel):
+    index: int
+    city: Optional[str] = None
+    result: Optional[PredictionResponse] = None
+    status_code: int = 200
+    error: Optional[str] = None
+    retry_after: Optional[int] = None  # seconds, for items rejected because an upstream is overloaded
+
+
+class BatchPredictionResponse(BaseModel):
+    results: list[BatchPredictionItem]
+
+
+# -------------------------------
+# Constants
+# -------------------------------
+USGS_API_URL = os.getenv("USGS_API_URL", "https://earthquake.usgs.gov/fdsnws/event/1/query")
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+# Global feed of every event in the past 30 days; mirrored into the local event store.
+# USGS regenerates all_month about every 15 minutes, so polling faster only re-parses the same feed.
+USGS_FEED_URL = os.getenv("USGS_FEED_URL", "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_month.geojson")
+USGS_FEED_REFRESH_SECONDS = float(os.getenv("USGS_FEED_REFRESH_SECONDS", "900"))
+
+# Major seismic hotspots globally: a CSV of (name, latitude, longitude) rows, or a
+# GeoJSON fault catalogue densified into points every HOTSPOTS_SPACING_KM
+hotspot_index = HotspotIndex.load(
+    os.getenv("HOTSPOTS_PATH", HOTSPOTS_PATH), spacing_km=float(os.getenv("HOTSPOTS_SPACING_KM", "10"))
+)
+
+# Batch prediction limits
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Geocoding cache: in-process LRU backed by a SQLite file shared by all workers
+GEOCODE_CACHE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "geocode.sqlite3")
+)
+geocode_cache = GeoCache(
+    GEOCODE_CACHE_PATH,
+    max_entries=int(os.getenv("GEOCODE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GEOCODE_CACHE_TTL", str(7 * 24 * 3600))),
+    negative_ttl=float(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", "3600")),
+)
+GEOCODE_CACHE_PRUNE_SECONDS = float(os.getenv("GEOCODE_CACHE_PRUNE_SECONDS", "3600"))  # 0 = never prune
+
+# Offline gazetteer (a GeoNames cities dump) answers most lookups before the cache or Nominatim
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities15000.txt")
+)
+gazetteer = None
+if os.path.exists(GAZETTEER_PATH):
+    gazetteer = Gazetteer.from_geonames(
+        GAZETTEER_PATH,
+        alternate_names=os.getenv("GAZETTEER_ALTERNATE_NAMES", "0") == "1",
+        min_population=int(os.getenv("GAZETTEER_MIN_POPULATION", "0")),
+    )
+    logger.info("Loaded gazetteer: %d places from %s", len(gazetteer), GAZETTEER_PATH)
+
+# One pooled client per upstream for the lifetime of the app
+HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2", "0") == "1"
+nominatim_client = UpstreamClient(
+    "nominatim",
+    headers={'User-Agent': 'DisasterLink/1.0'},
+    max_connections=int(os.getenv("NOMINATIM_MAX_CONNECTIONS", "4")),
+    max_keepalive_connections=int(os.getenv("NOMINATIM_MAX_KEEPALIVE", "4")),
+    connect_timeout=float(os.getenv("NOMINATIM_CONNECT_TIMEOUT", "3")),
+    read_timeout=float(os.getenv("NOMINATIM_READ_TIMEOUT", "5")),
+    retries=int(os.getenv("NOMINATIM_RETRIES", "2")),
+    http2=HTTP2_ENABLED,
+    failure_threshold=int(os.getenv("NOMINATIM_BREAKER_FAILURES", "5")),
+    reset_after=float(os.getenv("NOMINATIM_BREAKER_RESET_SECONDS", "30")),
+)
+usgs_client = UpstreamClient(
+    "usgs",
+    max_connections=int(os.getenv("USGS_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("USGS_MAX_KEEPALIVE", "10")),
+    connect_timeout=float(os.getenv("USGS_CONNECT_TIMEOUT", "3")),
+    read_timeout=float(os.getenv("USGS_READ_TIMEOUT", "10")),
+    retries=int(os.getenv("USGS_RETRIES", "2")),
+    http2=HTTP2_ENABLED,
+    failure_threshold=int(os.getenv("USGS_BREAKER_FAILURES", "5")),
+    reset_after=float(os.getenv("USGS_BREAKER_RESET_SECONDS", "30")),
+)
+
+# Recent events served locally; falls back to a live USGS query while stale
+# (stale once two refreshes in a row have failed)
+seismic_store = SeismicEventStore(
+    stale_after=float(os.getenv("USGS_FEED_STALE_SECONDS", str(3 * USGS_FEED_REFRESH_SECONDS)))
+)
+
+# Events that first appear in a feed download are pushed to geofenced SSE
+# subscribers, so dashboards get new quakes without polling /predict
+live_hub = LiveEventHub(
+    queue_size=int(os.getenv("LIVE_FEED_QUEUE_SIZE", "100")),
+    max_subscribers=int(os.getenv("LIVE_FEED_MAX_SUBSCRIBERS", "10000")),
+)
+LIVE_FEED_KEEPALIVE_SECONDS = float(os.getenv("LIVE_FEED_KEEPALIVE_SECONDS", "15"))
+LIVE_FEED_RETRY_SECONDS = 5  # SSE reconnect delay, also the Retry-After when the hub is full
+
+
+def new_feed_parser() -> ProcessPoolExecutor:
+    # spawn: forking a process that runs threads and an event loop is unsafe
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+
+# One process per worker parses feed downloads (see live_feed.parse_download)
+feed_parser = None
+
+# Live activity lookups: a per-request latency budget, and the last good score
+# per ~10 km area, served while a refresh runs in the background
+PREDICT_BUDGET_SECONDS = float(os.getenv("PREDICT_BUDGET_MS", "1500")) / 1000
+ACTIVITY_FRESH_SECONDS = float(os.getenv("ACTIVITY_FRESH_SECONDS", "300"))
+activity_cache = StaleCache(
+    max_entries=int(os.getenv("ACTIVITY_CACHE_SIZE", "4096")),
+    max_age=float(os.getenv("ACTIVITY_CACHE_MAX_AGE", str(24 * 3600))),
+)
+background_refreshes = BackgroundTasks()
+
+# Global risk grid: the formula evaluated over every cell at a reference depth,
+# memory-mapped by every worker and served as map tiles
+RISK_GRID_PATH = os.getenv(
+    "RISK_GRID_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "risk_grid.npy")
+)
+RISK_GRID_RESOLUTION = float(os.getenv("RISK_GRID_RESOLUTION", "0.25"))  # degrees per cell
+RISK_GRID_DEPTH_KM = float(os.getenv("RISK_GRID_DEPTH_KM", "10"))
+RISK_GRID_REFRESH_SECONDS = float(os.getenv("RISK_GRID_REFRESH_SECONDS", "900"))  # 0 = never build in the API
+RISK_GRID_MAX_ZOOM = 12
+RISK_GRID_STARTUP_POLL_SECONDS = 2  # how often a worker without a grid checks whether it can build one
+risk_grid = RiskGrid(RISK_GRID_PATH)
+
+# Per-zone models are loaded at import time so that a pre-forking server
+# (gunicorn --preload) shares them copy-on-write across its workers
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+# "numpy" serves the flattened .trees.npz ensembles without importing xgboost.
+# Opt-in "auto" also loads the native .ubj boosters and uses them for batches
+# larger than MODEL_NUMPY_MAX_ROWS rows (faster under heavy micro-batching, at
+# the cost of importing xgboost and holding both forms); "xgboost" uses only the boosters
+model_registry = ModelRegistry(
+    MODEL_DIR,
+    evaluator=os.getenv("MODEL_EVALUATOR", "numpy"),
+    numpy_max_rows=int(os.getenv("MODEL_NUMPY_MAX_ROWS", "8")),
+)
+if os.getenv("PRELOAD_MODELS", "1") == "1":
+    model_registry.load()
+
+# Concurrent ML predictions are micro-batched per zone and run off the event loop
+inference_executor = InferenceExecutor(
+    model_registry,
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "64")),
+    max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "2")),
+    max_workers=int(os.getenv("INFERENCE_THREADS", "2")),
+    observe_batch=lambda size: INFERENCE_BATCH_SIZE.observe(size),
+)
+
+# Hot reload: a version published under MODEL_DIR (see model_artifacts.py) is
+# loaded and validated off the event loop, then swapped in. Requests already
+# routed finish on the registry they started with; a replaced registry is freed
+# once the last of them completes (retired_registries only tracks it weakly).
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "30"))  # 0 = reload only via POST /models/reload
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN")  # if set, required in X-Admin-Token for /models/reload
+model_reload_lock = asyncio.Lock()
+model_reload_state = {"reloaded_at": None, "rejected_version": None, "last_error": None}
+retired_registries = weakref.WeakSet()
+
+# Coalesce identical in-flight upstream lookups and predictions
+PREDICT_SINGLEFLIGHT = os.getenv("PREDICT_SINGLEFLIGHT", "1") == "1"
+geocode_flight = SingleFlight("geocode")
+activity_flight = SingleFlight("usgs_activity")
+prediction_flight = SingleFlight("prediction")
+
+# Serialized /predict responses, keyed by normalized city, depth bucket and mode.
+# Formula answers live until the activity score behind them can change; ML answers
+# until the UTC hour (the finest calendar feature the zone models use) changes.
+# Degraded (stale/fallback activity) answers are never cached.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # upper bound; 0 disables the cache
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "4096")) if RESPONSE_CACHE_TTL > 0 else 0,
+    depth_step=float(os.getenv("RESPONSE_CACHE_DEPTH_STEP_KM", "0.5")),
+)
+
+# -------------------------------
+# Metrics
+# -------------------------------
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "prediction_stage_seconds", "Time spent in each prediction stage.", ("stage",)
+)
+REQUEST_SECONDS = metrics.histogram(
+    "prediction_request_seconds", "End-to-end handler latency per endpoint.", ("endpoint",)
+)
+FALLBACKS = metrics.counter(
+    "prediction_fallbacks_total", "Predictions that used a degraded data path.", ("kind",)
+)
+metrics.collector(
+    "upstream_requests_total", "Requests sent to each upstream, including retries.", "counter", ("upstream",),
+    lambda: [((c.name,), c.stats["requests"]) for c in (nominatim_client, usgs_client)],
+)
+metrics.collector(
+    "upstream_retries_total", "Retried upstream requests.", "counter", ("upstream",),
+    lambda: [((c.name,), c.stats["retries"]) for c in (nominatim_client, usgs_client)],
+)
+metrics.collector(
+    "upstream_errors_total", "Upstream requests that failed after retries.", "counter", ("upstream",),
+    lambda: [((c.name,), c.stats["errors"]) for c in (nominatim_client, usgs_client)],
+)
+metrics.collector(
+    "upstream_circuit_open", "1 while the upstream's circuit breaker is rejecting calls.", "gauge", ("upstream",),
+    lambda: [((c.name,), int(c.breaker.state != "closed")) for c in (nominatim_client, usgs_client)],
+)
+metrics.collector(
+    "upstream_circuit_rejections_total", "Calls rejected by an open circuit breaker.", "counter", ("upstream",),
+    lambda: [((c.name,), c.breaker.stats["rejected"]) for c in (nominatim_client, usgs_client)],
+)
+metrics.collector(
+    "geocode_cache_events_total", "Geocoding cache lookups by outcome.", "counter", ("outcome",),
+    lambda: [((k,), v) for k, v in geocode_cache.snapshot().items() if k not in ("memory_entries", "max_entries")],
+)
+metrics.collector(
+    "response_cache_events_total", "Prediction response cache lookups and writes by outcome.", "counter", ("outcome",),
+    lambda: [((k,), response_cache.stats[k]) for k in ("hits", "misses", "expired", "stores", "evictions")],
+)
+metrics.collector(
+    "gazetteer_lookups_total", "Offline gazetteer lookups by outcome.", "counter", ("outcome",),
+    lambda: [((k,), v) for k, v in gazetteer.stats.items()] if gazetteer else [],
+)
+metrics.collector(
+    "singleflight_calls_total", "Coalesced calls by role (leader ran the work, shared awaited it).", "counter",
+    ("flight", "role"),
+    lambda: [((f.name, role), f.stats[role]) for f in (geocode_flight, activity_flight, prediction_flight)
+             for role in ("leaders", "shared")],
+)
+MODEL_RELOADS = metrics.counter(
+    "model_reloads_total", "Model version reloads by outcome (swapped or rejected).", ("outcome",)
+)
+metrics.collector(
+    "model_registries_retired_in_use", "Replaced model versions still held by in-flight requests.", "gauge", (),
+    lambda: [((), len(retired_registries))],
+)
+INFERENCE_BATCH_SIZE = metrics.histogram(
+    "inference_batch_size", "Rows per micro-batch sent to the zone models.", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+metrics.collector(
+    "seismic_store_events", "Events held in the local USGS event store.", "gauge", (),
+    lambda: [((), seismic_store.size)],
+)
+metrics.collector(
+    "live_feed_subscribers", "Connected live event stream clients.", "gauge", (),
+    lambda: [((), live_hub.subscribers)],
+)
+metrics.collector(
+    "live_feed_events_total", "Live feed activity: new events seen, deliveries to clients and deliveries dropped.",
+    "counter", ("kind",),
+    lambda: [((k,), live_hub.stats[k]) for k in ("new_events", "deliveries", "dropped")],
+)
+
+
+# -------------------------------
+# Background Ingestion
+# -------------------------------
+async def refresh_seismic_store() -> None:
+    """
+    Download the global recent-events feed, swap it into the local store and
+    push the events that are new since the last download to live subscribers.
+    The download is parsed and indexed in the feed parser process, so the
+    event loop only swaps in the result.
+    """
+    global feed_parser
+    response = await usgs_client.get(USGS_FEED_URL, timeout=httpx.Timeout(60.0, connect=usgs_client.client.timeout.connect))
+    response.raise_for_status()
+    try:
+        snapshot, ids, events = await asyncio.get_running_loop().run_in_executor(
+            feed_parser, parse_download, response.content, live_hub.seen
+        )
+    except BrokenProcessPool:
+        feed_parser = new_feed_parser()  # the next refresh gets a fresh process
+        raise
+    seismic_store.swap(snapshot)
+    live_hub.publish(live_hub.record_download(ids, events))
+
+
+async def seismic_ingestion_loop() -> None:
+    while True:
+        try:
+            await refresh_seismic_store()
+        except Exception as exc:
+            logger.warning("USGS feed refresh failed: %s", exc)
+        await asyncio.sleep(USGS_FEED_REFRESH_SECONDS)
+
+
+async def geocode_prune_loop() -> None:
+    """
+    Delete expired rows from the on-disk geocoding cache, which otherwise only grows.
+    """
+    while True:
+        await asyncio.sleep(GEOCODE_CACHE_PRUNE_SECONDS)
+        try:
+            removed = await asyncio.to_thread(geocode_cache.prune)
+            if removed:
+                logger.info("Pruned %d expired geocoding cache rows", removed)
+        except Exception as exc:
+            logger.warning("Geocoding cache prune failed: %s", exc)
+
+
+def rebuild_risk_grid() -> None:
+    events = seismic_store.recent(days=30)
+    grid = build_grid(score_rows, RISK_GRID_RESOLUTION, RISK_GRID_DEPTH_KM, events)
+    write_grid(RISK_GRID_PATH, grid)
+    logger.info("Risk grid rebuilt: %s cells from %d events", grid.shape, len(events[0]))
+
+
+async def risk_grid_loop() -> None:
+    """
+    Rebuild the grid once it is older than the refresh interval. Workers share
+    the file, so whichever notices first rebuilds it and the rest just re-map it.
+    Until a grid exists the loop checks every few seconds, so the first one is
+    built right after the first feed download instead of one interval later.
+    """
+    while True:
+        try:
+            if seismic_store.is_fresh() and risk_grid.age() >= RISK_GRID_REFRESH_SECONDS:
+                await asyncio.to_thread(rebuild_risk_grid)
+        except Exception as exc:
+            logger.warning("Risk grid rebuild failed: %s", exc)
+        if risk_grid.current()[0] is None:
+            await asyncio.sleep(RISK_GRID_STARTUP_POLL_SECONDS)
+        else:
+            await asyncio.sleep(min(USGS_FEED_REFRESH_SECONDS, RISK_GRID_REFRESH_SECONDS))
+
+
+def load_model_version() -> ModelRegistry:
+    candidate = ModelRegistry(MODEL_DIR, evaluator=model_registry.evaluator, numpy_max_rows=model_registry.numpy_max_rows).load()
+    candidate.validate()
+    return candidate
+
+
+async def reload_models(force: bool = False) -> dict:
+    """
+    Load the version CURRENT names, validate it on a smoke batch and swap it in.
+    Does nothing if that version is already served or was rejected before,
+    unless forced (which also re-reads a flat model directory). A version that
+    fails to load or validate is rejected and the served models stay in place.
+    """
+    global model_registry
+    async with model_reload_lock:
+        version = current_version(MODEL_DIR)
+        if not force and version in (model_registry.version, model_reload_state["rejected_version"]):
+            return {"version": model_registry.version, "swapped": False}
+        try:
+            candidate = await asyncio.to_thread(load_model_version)
+        except Exception as exc:
+            MODEL_RELOADS.inc("rejected")
+            model_reload_state.update(rejected_version=version, last_error=str(exc))
+            logger.warning("Model version %s rejected: %s", version, exc)
+            raise ValueError(f"Model version {version} rejected: {exc}") from exc
+
+        previous = model_registry
+        model_registry = inference_executor.registry = candidate
+        retired_registries.add(previous)
+        response_cache.clear()  # cached ML answers came from the previous models
+        MODEL_RELOADS.inc("swapped")
+        model_reload_state.update(reloaded_at=datetime.now().isoformat(timespec="seconds"), rejected_version=None, last_error=None)
+        logger.info("Switched zone models from version %s to %s", previous.version, candidate.version)
+        return {"previous_version": previous.version, "version": candidate.version, "swapped": True}
+
+
+async def model_watch_loop() -> None:
+    """
+    Poll CURRENT so every worker picks up a newly published version on its own.
+    """
+    while True:
+        await asyncio.sleep(MODEL_WATCH_SECONDS)
+        try:
+            await reload_models()
+        except Exception:
+            pass  # logged by reload_models; the rejected version is not retried
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global feed_parser
+    feed_parser = new_feed_parser()
+    ingestion = asyncio.create_task(seismic_ingestion_loop())
+    grid_builder = asyncio.create_task(risk_grid_loop()) if RISK_GRID_REFRESH_SECONDS > 0 else None
+    model_watcher = asyncio.create_task(model_watch_loop()) if MODEL_WATCH_SECONDS > 0 else None
+    geocode_pruner = asyncio.create_task(geocode_prune_loop()) if GEOCODE_CACHE_PRUNE_SECONDS > 0 else None
+    yield
+    ingestion.cancel()
+    if grid_builder:
+        grid_builder.cancel()
+    if model_watcher:
+        model_watcher.cancel()
+    if geocode_pruner:
+        geocode_pruner.cancel()
+    await nominatim_client.aclose()
+    await usgs_client.aclose()
+    inference_executor.shutdown()
+    feed_parser.shutdown(wait=False, cancel_futures=True)
+    geocode_cache.close()
 
 
 # -------------------------------
@@ -32,22 +473,21 @@ class PredictionResponse(BaseModel):
 app = FastAPI(
     title="DisasterLink Earthquake Prediction API",
     description="API to predict earthquake magnitude and risk based on city and depth using USGS data and rule-based model.",
-    version="5.1.0"  # Updated stable version
+    version="5.1.0",  # Updated stable version
+    lifespan=lifespan,
 )
 
-# -------------------------------
-# Constants
-# -------------------------------
-USGS_API_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
-
-# Major seismic hotspots globally
-SEISMIC_HOTSPOTS = [
-    ("Japan Trench", 38.0, 143.0),
-    ("San Andreas Fault, USA", 34.05, -118.24),
-    ("Ring of Fire, Chile", -30.5, -71.5),
-    ("Himalayan Belt, Nepal", 28.0, 84.0),
-    ("Sunda Arc, Indonesia", -6.2, 106.8),
-]
+# The React app reads the live event stream and the risk tiles straight from
+# this service, so its origin must be allowed (comma-separated, "*" for any)
+CORS_ALLOW_ORIGINS = [o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
+if CORS_ALLOW_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ALLOW_ORIGINS,
+        allow_methods=["GET", "POST"],
+        allow_headers=["Content-Type", "If-None-Match"],
+        expose_headers=["ETag"],
+    )
 
 # -------------------------------
 # Helper Functions
@@ -66,29 +506,114 @@ def calculate_risk(magnitude: float) -> str:
 
 async def get_coordinates(city: str) -> tuple[float, float]:
     """
-    Fetch latitude and longitude for a given city using OpenStreetMap (Nominatim).
+    Fetch latitude and longitude for a given city: from the offline gazetteer
+    when it knows the name, otherwise using OpenStreetMap (Nominatim).
+    Nominatim results, including "city not found", are served from the geocoding cache when possible.
     """
-    nominatim_url = f"https://nominatim.openstreetmap.org/search?city={city}&format=json&limit=1"
-    headers = {'User-Agent': 'DisasterLink/1.0'}
+    if gazetteer is not None:
+        coordinates = gazetteer.lookup(city)
+        if coordinates is not None:
+            return coordinates
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(nominatim_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            if not data:
-                raise HTTPException(status_code=404, detail=f"City '{city}' not found.")
-            return float(data[0]['lat']), float(data[0]['lon'])
-        except httpx.RequestError as exc:
-            raise HTTPException(status_code=503, detail=f"Error connecting to geolocation service: {exc}")
-        except (KeyError, IndexError):
-            raise HTTPException(status_code=404, detail=f"Could not parse coordinates for city: '{city}'.")
+    cache_key = normalize_city(city)
+    cached = geocode_cache.get_memory(cache_key)
+    if cached is MISS:
+        # SQLite can wait on another worker's write for up to its busy timeout
+        cached = await asyncio.to_thread(geocode_cache.get_disk, cache_key)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found.")
+    if cached is not MISS:
+        return cached
+
+    return await geocode_flight.do(cache_key, lambda: fetch_coordinates(city, cache_key))
+
+
+async def fetch_coordinates(city: str, cache_key: str) -> tuple[float, float]:
+    try:
+        response = await nominatim_client.get(NOMINATIM_URL, params={"city": city, "format": "json", "limit": 1})
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            await asyncio.to_thread(geocode_cache.put, cache_key, None)
+            raise HTTPException(status_code=404, detail=f"City '{city}' not found.")
+        coordinates = float(data[0]['lat']), float(data[0]['lon'])
+        await asyncio.to_thread(geocode_cache.put, cache_key, coordinates)
+        return coordinates
+    except CircuitOpenError as exc:
+        raise HTTPException(
+            status_code=503, detail=f"Geolocation service unavailable: {exc}",
+            headers={"Retry-After": str(nominatim_client.retry_after())},
+        )
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=503, detail=f"Error connecting to geolocation service: {exc}")
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code not in (429, 503):
+            raise
+        # Nominatim is rate limiting or shedding load; pass on when it will accept calls again
+        raise HTTPException(
+            status_code=exc.response.status_code, detail="The geolocation service is overloaded; retry later.",
+            headers={"Retry-After": str(nominatim_client.retry_after(exc.response))},
+        )
+    except (KeyError, IndexError):
+        raise HTTPException(status_code=404, detail=f"Could not parse coordinates for city: '{city}'.")
+
+
+def activity_area(latitude: float, longitude: float) -> tuple[float, float]:
+    """Key of the ~10 km area whose live activity score is shared."""
+    return round(latitude, 1), round(longitude, 1)
 
 
-async def get_recent_seismic_activity(latitude: float, longitude: float) -> float:
+async def get_recent_seismic_activity(latitude: float, longitude: float, deadline: float = None) -> tuple[float, str]:
     """
     Fetch recent earthquake activity within 30 days for the given location.
-    Returns an activity score between 0.0 and 3.0
+    Returns an activity score between 0.0 and 3.0 and where it came from
+    ("fresh", "stale" or "fallback").
+    Served from the local event store when its feed is fresh; otherwise USGS is
+    queried directly, but never for longer than the time left until `deadline`
+    (event-loop time). A known but aging score for the area is returned at once
+    while it is refreshed in the background.
+    """
+    if seismic_store.is_fresh():
+        return seismic_store.activity_score(latitude, longitude, radius_km=250, days=30), "fresh"
+
+    area = activity_area(latitude, longitude)
+    cached = activity_cache.get(area)
+    if cached is not None and cached[1] < ACTIVITY_FRESH_SECONDS:
+        return cached[0], "fresh"
+
+    FALLBACKS.inc("usgs_live_query")
+    refresh = background_refreshes.spawn(activity_flight.do(area, lambda: fetch_live_activity(latitude, longitude, area)))
+    if cached is not None:
+        FALLBACKS.inc("activity_stale")
+        return cached[0], "stale"
+
+    if deadline is None:
+        deadline = asyncio.get_running_loop().time() + PREDICT_BUDGET_SECONDS
+    try:
+        # shield: on timeout the lookup keeps running and fills the cache for later requests
+        score = await asyncio.wait_for(asyncio.shield(refresh), max(0.0, deadline - asyncio.get_running_loop().time()))
+        return score, "fresh"
+    except asyncio.TimeoutError:
+        FALLBACKS.inc("activity_budget_exceeded")
+    except Exception as exc:
+        FALLBACKS.inc("activity_unavailable")
+        logger.debug("Live activity lookup failed: %s", exc)
+    return last_known_activity(latitude, longitude)
+
+
+def last_known_activity(latitude: float, longitude: float) -> tuple[float, str]:
+    """
+    Best answer without USGS: the (stale) local event store if it ever loaded, else 0.0.
+    """
+    if seismic_store.updated_at > 0:
+        return seismic_store.activity_score(latitude, longitude, radius_km=250, days=30), "stale"
+    return 0.0, "fallback"
+
+
+async def fetch_live_activity(latitude: float, longitude: float, area) -> float:
+    """
+    Query USGS for the point and remember the score for its area. Errors are
+    raised (not turned into 0.0) so callers can fall back to a known value.
     """
     thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S')
     params = {
@@ -100,21 +625,71 @@ async def get_recent_seismic_activity(latitude: float, longitude: float) -> floa
     }
     activity_score = 0.0
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(USGS_API_URL, params=params)
-        if response.status_code == 200:
-            events = response.json().get('features', [])
-            if events:
-                total_magnitude = sum(
-                    event['properties']['mag'] for event in events if event['properties']['mag'] is not None
-                )
-                # Normalized activity score
-                activity_score = total_magnitude / (len(events) * 2.0)
-    except Exception:
-        pass  # Fail gracefully if USGS API request fails
+    response = await usgs_client.get(USGS_API_URL, params=params)
+    response.raise_for_status()
+    events = response.json().get('features', [])
+    if events:
+        total_magnitude = sum(
+            event['properties']['mag'] for event in events if event['properties']['mag'] is not None
+        )
+        # Normalized activity score
+        activity_score = total_magnitude / (len(events) * 2.0)
+
+    activity_score = min(activity_score, 3.0)  # Cap to prevent extreme spikes
+    activity_cache.put(area, activity_score)
+    return activity_score
 
-    return min(activity_score, 3.0)  # Cap to prevent extreme spikes
+
+def score_rows(latitudes, longitudes, depths, activity) -> dict:
+    """
+    Rule-based magnitude formula evaluated as one NumPy pass over many rows.
+    Returns the per-row components and the unrounded, uncapped magnitude.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    depths = np.asarray(depths, dtype=np.float64)
+    activity = np.asarray(activity, dtype=np.float64)
+
+    # Base score (reduced to avoid overestimation for non-risky areas)
+    base_score = 2.0
+
+    # Depth impact (up to +2.0)
+    depth_impact = 2.0 * (np.minimum(depths, 300) / 300)
+
+    # Proximity to seismic hotspots (max +2.5, fading to 0 at 1250 km)
+    distance_km = hotspot_index.nearest_km(latitudes, longitudes)
+    proximity_impact = np.maximum(0, 2.5 - (distance_km / 500.0))
+
+    magnitude = base_score + depth_impact + proximity_impact + (activity * 0.5)
+    return {
+        "base_score": base_score,
+        "depth_impact": depth_impact,
+        "proximity_impact": proximity_impact,
+        "activity_impact": activity,
+        "magnitude": magnitude,
+    }
+
+
+def finalize_magnitude(raw_magnitude: float) -> float:
+    return min(round(float(raw_magnitude), 2), 9.5)
+
+
+async def predict_ml_rows(latitudes, longitudes, depths) -> tuple[list, np.ndarray]:
+    """
+    Route each row through get_risk_zone and score it on the inference executor,
+    which batches rows per zone model with other in-flight requests.
+    Returns the (risk zone, model zone) routes and the magnitudes, which are
+    NaN for rows whose zone has no model.
+    """
+    registry = model_registry  # routed and scored on the same version, even across a reload
+    routes = [registry.route(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+    magnitudes = np.full(len(routes), np.nan)
+    served = [i for i, (_, m) in enumerate(routes) if m is not None]
+    if served:
+        magnitudes[served] = await inference_executor.predict_many(
+            [routes[i][1] for i in served], [depths[i] for i in served], registry
+        )
+    return routes, magnitudes
 
 
 # -------------------------------
@@ -125,59 +700,284 @@ def read_root():
     return {"message": "Welcome to the DisasterLink Earthquake Prediction API (v5.1 - Stable Formula)!"}
 
 
+# -------------------------------
+# Geocoding Cache Stats
+# -------------------------------
+@app.get("/geocode/cache")
+def geocode_cache_stats():
+    return geocode_cache.snapshot()
+
+
+# -------------------------------
+# City Autocomplete
+# -------------------------------
+@app.get("/geocode/suggest")
+def geocode_suggest(q: str, limit: int = 10):
+    """
+    Cities whose name starts with `q`, most populous first, from the offline gazetteer.
+    """
+    if gazetteer is None:
+        raise HTTPException(status_code=503, detail="No gazetteer is loaded; set GAZETTEER_PATH to a GeoNames cities dump.")
+    return {"query": q, "suggestions": gazetteer.suggest(q, limit=max(1, min(limit, 50)))}
+
+
+@app.get("/geocode/gazetteer")
+def gazetteer_stats():
+    return {"path": GAZETTEER_PATH, "loaded": gazetteer is not None, **(gazetteer.snapshot() if gazetteer else {})}
+
+
+# -------------------------------
+# Upstream Connection Pool Stats
+# -------------------------------
+@app.get("/http/pools")
+def http_pool_stats():
+    return [nominatim_client.pool_stats(), usgs_client.pool_stats()]
+
+
+@app.get("/singleflight")
+def singleflight_stats():
+    return [geocode_flight.snapshot(), activity_flight.snapshot(), prediction_flight.snapshot()]
+
+
+@app.get("/models")
+def loaded_models():
+    return {
+        **model_registry.snapshot(),
+        "reload": {**model_reload_state, "retired_in_use": sorted(str(r.version) for r in retired_registries)},
+        "executor": inference_executor.snapshot(),
+    }
+
+
+@app.post("/models/reload")
+async def reload_models_endpoint(http_request: Request, force: bool = False):
+    """
+    Switch this worker to the model version CURRENT names now, instead of at
+    the next watcher poll. 422 if that version fails validation.
+    """
+    token = http_request.headers.get("x-admin-token", "")
+    if MODEL_ADMIN_TOKEN and not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    try:
+        return await reload_models(force)
+    except Exception as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+# -------------------------------
+# Live Event Stream
+# -------------------------------
+@app.get("/events/stream")
+async def live_events(
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    radius_km: float = Query(500, gt=0, le=20016),
+    min_magnitude: Optional[float] = None,
+):
+    """
+    Server-Sent Events stream of earthquakes that appear in the USGS feed from
+    now on within `radius_km` of the point, each as an `earthquake` event whose
+    data carries the event fields and its distance from the point.
+    """
+    try:
+        subscription = live_hub.subscribe(latitude, longitude, radius_km, min_magnitude)
+    except RuntimeError as exc:
+        # Full: clients should come back on the same schedule as an SSE reconnect
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": str(LIVE_FEED_RETRY_SECONDS)})
+
+    async def stream():
+        try:
+            yield f"retry: {LIVE_FEED_RETRY_SECONDS * 1000}\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), LIVE_FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # keeps proxies from closing an idle stream
+        finally:
+            live_hub.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/events/hub")
+def live_event_stats():
+    return live_hub.snapshot()
+
+
+# -------------------------------
+# Risk Grid Tiles
+# -------------------------------
+@app.get("/risk-grid")
+def risk_grid_info():
+    return {**risk_grid.snapshot(), "depth_km": RISK_GRID_DEPTH_KM, "max_zoom": RISK_GRID_MAX_ZOOM}
+
+
+@app.get("/risk-grid/{z}/{x}/{y}")
+def risk_grid_tile(z: int, x: int, y: int, request: Request, format: Literal["png", "bin"] = "png"):
+    """
+    One 256×256 Web Mercator tile of the precomputed risk grid, as a palette
+    PNG or as raw uint8 magnitude codes (0 = no data, else (code - 1) * 9.5 / 254).
+    """
+    if not (0 <= z <= RISK_GRID_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    try:
+        body, version = risk_grid.tile(z, x, y, format)
+    except LookupError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+    headers = {
+        "ETag": f'"{version}-{format}"',
+        "Cache-Control": f"public, max-age={int(RISK_GRID_REFRESH_SECONDS) or 3600}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    media_type = "image/png" if format == "png" else "application/octet-stream"
+    return Response(body, media_type=media_type, headers=headers)
+
+
+# -------------------------------
+# Metrics Endpoint
+# -------------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # -------------------------------
 # Prediction Endpoint
 # -------------------------------
+def response_ttl(result: PredictionResponse) -> float:
+    """
+    Seconds a prediction stays valid: until the activity score behind it can
+    change. ML answers depend on the zone model and the current calendar
+    features, the finest of which is the UTC hour.
+    """
+    now = time.time()
+    if result.prediction_mode == "ml":
+        return min(RESPONSE_CACHE_TTL, 3600 - now % 3600)
+    if result.activity_source != "fresh":
+        return 0.0
+    if seismic_store.is_fresh():
+        # Scores come from the last feed download and only change with the next one
+        ttl = seismic_store.updated_at + USGS_FEED_REFRESH_SECONDS - now
+    else:
+        # Live-query scores are fresh for ACTIVITY_FRESH_SECONDS after they were fetched
+        cached = activity_cache.get(activity_area(result.latitude, result.longitude))
+        ttl = ACTIVITY_FRESH_SECONDS - cached[1] if cached is not None else 0.0
+    return min(RESPONSE_CACHE_TTL, ttl)
+
+
+async def compute_and_cache(key, request: PredictionRequest) -> CachedResponse:
+    result = await compute_prediction(request)
+    with STAGE_SECONDS.time("serialization"):
+        body = result.model_dump_json().encode()
+    return response_cache.put(key, body, response_ttl(result), result)
+
+
+async def serve_prediction(request: PredictionRequest) -> CachedResponse:
+    """
+    The serialized prediction for a request: from the response cache, or
+    computed once for all concurrent requests with the same key.
+    """
+    key = (normalize_city(request.city), response_cache.depth_bucket(request.depth), request.mode)
+    entry = response_cache.get(key)
+    if entry is None:
+        if PREDICT_SINGLEFLIGHT:
+            entry = await prediction_flight.do(key, lambda: compute_and_cache(key, request))
+        else:
+            entry = await compute_and_cache(key, request)
+    if entry.value.city != request.city:
+        # Same normalized city spelled differently: echo the caller's spelling
+        result = entry.value.model_copy(update={"city": request.city})
+        entry = CachedResponse(result.model_dump_json().encode(), entry.expires_at, result)
+    return entry
+
+
+def prediction_headers(entry: CachedResponse) -> dict:
+    max_age = entry.max_age()
+    return {"ETag": entry.etag, "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache"}
+
+
 @app.post("/predict", response_model=PredictionResponse)
 async def predict_earthquake(request: PredictionRequest):
     """
     Predict earthquake magnitude and risk for a given city and depth.
+    Concurrent requests for the same city and depth share one computation.
     """
+    with REQUEST_SECONDS.time("predict"):
+        entry = await serve_prediction(request)
+        return Response(entry.body, media_type="application/json", headers=prediction_headers(entry))
+
+
+@app.get("/predict", response_model=PredictionResponse)
+async def predict_earthquake_get(request: Annotated[PredictionRequest, Query()], http_request: Request):
+    """
+    Same as POST /predict with the fields as query parameters, so browsers and
+    reverse proxies can cache the answer and revalidate it with If-None-Match.
+    """
+    with REQUEST_SECONDS.time("predict_get"):
+        entry = await serve_prediction(request)
+        headers = prediction_headers(entry)
+        if etag_matches(http_request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+
+@app.get("/predict/cache")
+def prediction_cache_stats():
+    return response_cache.snapshot()
+
+
+async def compute_prediction(request: PredictionRequest) -> PredictionResponse:
+    deadline = asyncio.get_running_loop().time() + PREDICT_BUDGET_SECONDS
     try:
         # Step 1: Fetch city coordinates
-        latitude, longitude = await get_coordinates(request.city)
-
-        # Step 2: Base score (reduced to avoid overestimation for non-risky areas)
-        base_score = 2.0
-
-        # Step 3: Depth impact (up to +2.0)
-        depth_factor = min(request.depth, 300) / 300
-        depth_impact = 2.0 * depth_factor
-
-        # Step 4: Proximity to seismic hotspots (max +2.5)
-        min_distance = float('inf')
-        for _, h_lat, h_lon in SEISMIC_HOTSPOTS:
-            distance = math.sqrt((latitude - h_lat) ** 2 + (longitude - h_lon) ** 2)
-            if distance < min_distance:
-                min_distance = distance
-        proximity_impact = max(0, 2.5 - (min_distance / 500.0))
-
-        # Step 5: Recent seismic activity
-        activity_impact = await get_recent_seismic_activity(latitude, longitude)
-
-        # Step 6: Final magnitude
-        final_magnitude = base_score + depth_impact + proximity_impact + (activity_impact * 0.5)
-        final_magnitude = min(round(final_magnitude, 2), 9.5)
-
-        # Step 7: Determine risk category
-        final_risk = calculate_risk(final_magnitude)
-
-        # Debugging logs (for development)
-        print("---- DEBUG INFO ----")
-        print(f"City: {request.city}")
-        print(f"Base Score: {base_score}")
-        print(f"Depth Impact: {depth_impact}")
-        print(f"Proximity Impact: {proximity_impact}")
-        print(f"Activity Impact: {activity_impact}")
-        print(f"Final Magnitude: {final_magnitude}")
-        print("--------------------")
+        with STAGE_SECONDS.time("geocode"):
+            latitude, longitude = await get_coordinates(request.city)
+
+        # ML mode: the zone's trained model, when one is available
+        if request.mode == "ml":
+            with STAGE_SECONDS.time("ml_inference"):
+                routes, magnitudes = await predict_ml_rows([latitude], [longitude], [request.depth])
+            (risk_zone, model_zone), = routes
+            if model_zone is not None:
+                final_magnitude = finalize_magnitude(magnitudes[0])
+                return PredictionResponse(
+                    city=request.city,
+                    latitude=latitude,
+                    longitude=longitude,
+                    predicted_magnitude=final_magnitude,
+                    predicted_risk=calculate_risk(final_magnitude),
+                    prediction_mode="ml",
+                    risk_zone=risk_zone,
+                    model_zone=model_zone,
+                )
+            FALLBACKS.inc("ml_model_missing")
+
+        # Step 2: Recent seismic activity
+        with STAGE_SECONDS.time("usgs_activity"):
+            activity_impact, activity_source = await get_recent_seismic_activity(latitude, longitude, deadline)
+
+        # Step 3-7: Base score, depth impact, hotspot proximity, final magnitude and risk category
+        with STAGE_SECONDS.time("scoring"):
+            scores = score_rows([latitude], [longitude], [request.depth], [activity_impact])
+            final_magnitude = finalize_magnitude(scores["magnitude"][0])
+            final_risk = calculate_risk(final_magnitude)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "city=%s base=%s depth_impact=%s proximity_impact=%s activity_impact=%s final_magnitude=%s",
+                request.city, scores["base_score"], scores["depth_impact"][0], scores["proximity_impact"][0],
+                activity_impact, final_magnitude,
+            )
 
         return PredictionResponse(
             city=request.city,
             latitude=latitude,
             longitude=longitude,
             predicted_magnitude=final_magnitude,
-            predicted_risk=final_risk
+            predicted_risk=final_risk,
+            activity_source=activity_source,
         )
 
     except HTTPException as http_exc:
@@ -186,15 +986,149 @@ async def predict_earthquake(request: PredictionRequest):
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
 
+# -------------------------------
+# Batch Prediction Endpoint
+# -------------------------------
+async def resolve_location(city: str, semaphore: asyncio.Semaphore) -> tuple[float, float, float, str]:
+    """
+    Coordinates, activity score and its source for one city, bounded by the
+    batch semaphore. Each city gets its own latency budget once it starts.
+    """
+    async with semaphore:
+        deadline = asyncio.get_running_loop().time() + PREDICT_BUDGET_SECONDS
+        latitude, longitude = await get_coordinates(city)
+        activity, source = await get_recent_seismic_activity(latitude, longitude, deadline)
+    return latitude, longitude, activity, source
+
+
+def _error_item(index: int, city: Optional[str], exc: Exception) -> BatchPredictionItem:
+    if isinstance(exc, HTTPException):
+        retry_after = (exc.headers or {}).get("Retry-After")
+        return BatchPredictionItem(
+            index=index, city=city, status_code=exc.status_code, error=str(exc.detail),
+            retry_after=int(retry_after) if retry_after else None,
+        )
+    if isinstance(exc, ValidationError):
+        detail = "; ".join(
+            f"{'.'.join(map(str, e['loc']))}: {e['msg']}" if e["loc"] else e["msg"] for e in exc.errors()
+        )
+        return BatchPredictionItem(index=index, city=city, status_code=422, error=detail)
+    return BatchPredictionItem(index=index, city=city, status_code=500, error=f"An internal error occurred: {exc}")
+
+
+async def run_batch(items: list[Any]) -> list[BatchPredictionItem]:
+    """
+    Validate each item on its own, resolve every distinct city once with bounded
+    concurrency, then score all resolvable rows in a single vectorized pass.
+    """
+    results: list[Optional[BatchPredictionItem]] = [None] * len(items)
+    valid = []  # (index, PredictionRequest)
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, PredictionRequest.model_validate(item)))
+        except ValidationError as exc:
+            city = item.get("city") if isinstance(item, dict) else None
+            results[index] = _error_item(index, city if isinstance(city, str) else None, exc)
+
+    # First spelling seen for each normalized city is the one sent upstream
+    unique_cities = {}
+    for _, req in valid:
+        unique_cities.setdefault(normalize_city(req.city), req.city)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    with STAGE_SECONDS.time("batch_resolve"):
+        resolved = await asyncio.gather(
+            *(resolve_location(city, semaphore) for city in unique_cities.values()), return_exceptions=True
+        )
+    locations = dict(zip(unique_cities.keys(), resolved))
+
+    rows = []  # (index, request, latitude, longitude, activity, activity source)
+    for index, req in valid:
+        location = locations[normalize_city(req.city)]
+        if isinstance(location, Exception):
+            results[index] = _error_item(index, req.city, location)
+        else:
+            rows.append((index, req, *location))
+
+    if rows:
+        _, reqs, lats, lons, activity, _ = zip(*rows)
+        depths = [r.depth for r in reqs]
+        with STAGE_SECONDS.time("batch_scoring"):
+            magnitudes = score_rows(lats, lons, depths, activity)["magnitude"]
+
+        # Rows asking for ML mode are overridden wherever their zone has a model
+        ml_rows = [i for i, r in enumerate(reqs) if r.mode == "ml"]
+        ml_results = {}
+        if ml_rows:
+            with STAGE_SECONDS.time("ml_inference"):
+                routes, ml_magnitudes = await predict_ml_rows(
+                    [lats[i] for i in ml_rows], [lons[i] for i in ml_rows], [depths[i] for i in ml_rows]
+                )
+            for i, route, raw in zip(ml_rows, routes, ml_magnitudes):
+                if route[1] is None:
+                    FALLBACKS.inc("ml_model_missing")
+                else:
+                    ml_results[i] = (route, raw)
+
+        for i, ((index, req, lat, lon, _, source), raw) in enumerate(zip(rows, magnitudes)):
+            mode_fields = {"activity_source": source}
+            if i in ml_results:
+                (risk_zone, model_zone), raw = ml_results[i]
+                mode_fields = {"prediction_mode": "ml", "risk_zone": risk_zone, "model_zone": model_zone}
+            final_magnitude = finalize_magnitude(raw)
+            results[index] = BatchPredictionItem(
+                index=index,
+                city=req.city,
+                result=PredictionResponse(
+                    city=req.city,
+                    latitude=lat,
+                    longitude=lon,
+                    predicted_magnitude=final_magnitude,
+                    predicted_risk=calculate_risk(final_magnitude),
+                    **mode_fields,
+                ),
+            )
+    return results
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(items: list[Any], http_request: Request):
+    """
+    Predict many cities at once. Invalid or unresolvable items (including ones
+    that are not objects) are reported individually with their own status code
+    instead of failing the batch. Send `Accept: application/x-ndjson` to get
+    the same results as one JSON line per item.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {BATCH_MAX_ITEMS} items.")
+
+    with REQUEST_SECONDS.time("predict_batch"):
+        results = await run_batch(items)
+
+    if "application/x-ndjson" in http_request.headers.get("accept", ""):
+        # Rows are scored together once every city is resolved, so the body is complete here
+        body = "".join(json.dumps(item.model_dump(exclude_none=True)) + "\n" for item in results)
+        return Response(body, media_type="application/x-ndjson")
+
+    return BatchPredictionResponse(results=results)
+
+
 """
 How to Run
 ----------
 1. Install dependencies:
-   pip install fastapi uvicorn httpx
+   pip install fastapi uvicorn httpx numpy scipy   # scipy: KD-tree for large hotspot/fault catalogues
+   pip install joblib scikit-learn xgboost   # for "mode": "ml"
 
 2. Run the app:
    uvicorn main:app --reload
 
+   With several workers, preload the app so the zone models are loaded once
+   and shared copy-on-write:
+   gunicorn main:app -k uvicorn.workers.UvicornWorker --workers 4 --preload
+
+   The React app (http://localhost:3000) reads /events/stream and the risk
+   tiles directly; set CORS_ALLOW_ORIGINS to its origin(s) when it runs elsewhere.
+
 3. Test Endpoint:
    POST http://127.0.0.1:8000/predict
    JSON Body Example:
@@ -202,5 +1136,25 @@ How to Run
        "city": "Delhi",
        "depth": 50
    }
+
+   Cacheable form (ETag, Cache-Control, 304 on If-None-Match):
+   GET http://127.0.0.1:8000/predict?city=Delhi&depth=50
+
+   City autocomplete (needs a GeoNames dump, e.g. data/cities15000.txt):
+   GET http://127.0.0.1:8000/geocode/suggest?q=Hyd
+
+   Pick up a newly trained model version now (workers also poll for it):
+   POST http://127.0.0.1:8000/models/reload
+
+   Live earthquakes within 300 km, as Server-Sent Events:
+   GET http://127.0.0.1:8000/events/stream?latitude=28.6&longitude=77.2&radius_km=300
+
+   Risk map tiles (built in the background from the USGS feed):
+   GET http://127.0.0.1:8000/risk-grid/{z}/{x}/{y}
+
+4. Benchmarks (local Nominatim/USGS stand-ins, never the real services):
+   python -m benchmarks.load --requests 2000 --concurrency 32 --output load.json
+   python -m benchmarks.micro --output micro.json
+   python -m benchmarks.compare old.json new.json
 """
 
@@ -0,0 +1,255 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+# -------------------------------
+# Fast-loading model artifacts
+# -------------------------------
+# Next to the joblib pickles, training exports:
+#   model_<zone>.ubj    each zone's booster in XGBoost's native binary format
+#   model_<zone>.trees.npz
+#                       the same booster flattened into node arrays for the
+#                       pure-NumPy evaluator in tree_ensemble.py
+#   preprocessing.npy   one structured array, one row per zone, holding the
+#                       MinMaxScaler parameters; the feature list is encoded in
+#                       the field names, so the file is self-describing and can
+#                       be memory-mapped with np.load(..., mmap_mode='r')
+# Loading these needs neither sklearn nor pickle; xgboost is only imported
+# when a .ubj booster is actually opened, and not at all for .trees.npz.
+#
+# A model directory is either flat (the artifacts directly in it) or versioned:
+#   versions/<version>/ one complete set of artifacts plus manifest.json, which
+#                       lists every file with its size and SHA-256
+#   CURRENT             the name of the version to serve
+# Training builds a new version next to the served one and publishes it by
+# atomically replacing CURRENT, so readers see the old set or the new set,
+# never a mix of both.
+
+PREPROCESSING_NAME = "preprocessing.npy"
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def booster_path(model_dir: str, zone: str) -> str:
+    return os.path.join(model_dir, f"model_{zone}.ubj")
+
+
+def trees_path(model_dir: str, zone: str) -> str:
+    return os.path.join(model_dir, f"model_{zone}.trees.npz")
+
+
+def export_booster(model, model_dir: str, zone: str) -> None:
+    """Write both serving formats for one zone's fitted XGBRegressor."""
+    from tree_ensemble import flatten_booster, save_ensemble
+    booster = model.get_booster()
+    booster.save_model(booster_path(model_dir, zone))
+    save_ensemble(trees_path(model_dir, zone), flatten_booster(booster))
+
+
+def write_preprocessing(path: str, features: list, scalers: dict) -> None:
+    """
+    Store {zone: fitted MinMaxScaler} as a structured array in `path`.
+    """
+    columns = [(name, np.float64) for name in features]
+    dtype = np.dtype([("zone", "U32"), ("scale", columns), ("min", columns)])
+    table = np.zeros(len(scalers), dtype=dtype)
+    for i, (zone, scaler) in enumerate(sorted(scalers.items())):
+        table[i]["zone"] = zone
+        table[i]["scale"] = tuple(np.asarray(scaler.scale_, dtype=np.float64))
+        table[i]["min"] = tuple(np.asarray(scaler.min_, dtype=np.float64))
+    tmp = path + ".tmp.npy"
+    np.save(tmp, table)
+    os.replace(tmp, path)
+
+
+class MinMaxParams:
+    """The two arrays MinMaxScaler.transform uses: X * scale_ + min_."""
+
+    def __init__(self, scale, minimum):
+        self.scale_ = np.ascontiguousarray(scale, dtype=np.float64)
+        self.min_ = np.ascontiguousarray(minimum, dtype=np.float64)
+
+    def transform(self, X):
+        return X * self.scale_ + self.min_
+
+
+def load_preprocessing(path: str) -> tuple[list, dict]:
+    """
+    Return (features, {zone: MinMaxParams}) from a preprocessing.npy file.
+    """
+    table = np.load(path, mmap_mode="r")
+    features = list(table.dtype["scale"].names)
+    params = {}
+    for row in table:
+        scale = np.array([row["scale"][name] for name in features])
+        minimum = np.array([row["min"][name] for name in features])
+        params[str(row["zone"])] = MinMaxParams(scale, minimum)
+    return features, params
+
+
+def current_version(model_dir: str):
+    """The version named by CURRENT, or None for a flat directory."""
+    try:
+        with open(os.path.join(model_dir, CURRENT_NAME)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(model_dir: str, version: str) -> str:
+    return os.path.join(model_dir, VERSIONS_DIR, version)
+
+
+def resolve_model_dir(model_dir: str) -> tuple[str, str]:
+    """Return (directory holding the artifacts to serve, version or None)."""
+    version = current_version(model_dir)
+    if version is None:
+        return model_dir, None
+    return version_dir(model_dir, version), version
+
+
+def create_version(model_dir: str, base_dir: str = None) -> tuple[str, str]:
+    """
+    Make an unpublished version directory, seeded with a copy of the files in
+    `base_dir` (copies, not links: training overwrites them in place).
+    Returns (version, path).
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    version, n = stamp, 1
+    while os.path.exists(version_dir(model_dir, version)):
+        n += 1
+        version = f"{stamp}-{n}"
+    path = version_dir(model_dir, version)
+    os.makedirs(path)
+    if base_dir is not None:
+        for name in os.listdir(base_dir):
+            source = os.path.join(base_dir, name)
+            if os.path.isfile(source) and name != CURRENT_NAME:
+                shutil.copy2(source, os.path.join(path, name))
+    return version, path
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(path: str, manifest: dict) -> dict:
+    """
+    Write manifest.json into a model directory, recording every other file in it.
+    """
+    manifest = dict(manifest)
+    manifest["files"] = {
+        name: {"bytes": os.path.getsize(os.path.join(path, name)), "sha256": file_digest(os.path.join(path, name))}
+        for name in sorted(os.listdir(path))
+        if name != MANIFEST_NAME and os.path.isfile(os.path.join(path, name))
+    }
+    target = os.path.join(path, MANIFEST_NAME)
+    with open(target + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(target + ".tmp", target)
+    return manifest
+
+
+def verify_manifest(path: str) -> list:
+    """
+    Problems found comparing a directory with its manifest (empty if it matches or has no file list).
+    """
+    manifest = read_manifest(path) or {}
+    problems = []
+    for name, expected in manifest.get("files", {}).items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            problems.append(f"{name}: missing")
+        elif os.path.getsize(file_path) != expected["bytes"] or file_digest(file_path) != expected["sha256"]:
+            problems.append(f"{name}: contents differ from the manifest")
+    return problems
+
+
+def publish_version(model_dir: str, version: str) -> None:
+    """Point CURRENT at `version` (atomic: serving processes see one or the other)."""
+    if not os.path.isdir(version_dir(model_dir, version)):
+        raise FileNotFoundError(f"No model version '{version}' in {model_dir}")
+    path = os.path.join(model_dir, CURRENT_NAME)
+    with open(path + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def prune_versions(model_dir: str, keep: int = 3) -> list:
+    """
+    Delete all but the newest `keep` versions, never the current one. Processes
+    still serving a deleted version are unaffected: its models are in memory.
+    """
+    root = os.path.join(model_dir, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+    current = current_version(model_dir)
+    versions = sorted(os.listdir(root))
+    removed = [v for v in versions[:max(0, len(versions) - keep)] if v != current]
+    for version in removed:
+        shutil.rmtree(version_dir(model_dir, version), ignore_errors=True)
+    return removed
+
+
+def load_booster(path: str):
+    import xgboost as xgb  # deferred: only paid when a booster is opened
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+def export_model_dir(model_dir: str) -> list:
+    """
+    Write .ubj boosters, flattened .trees.npz ensembles and preprocessing.npy
+    for every pickled zone model in `model_dir`. Returns the zones whose booster was exported.
+    """
+    import joblib
+    features = list(joblib.load(os.path.join(model_dir, "features.pkl")))
+    scalers, exported = {}, []
+    for name in sorted(os.listdir(model_dir)):
+        if name.startswith("scaler_") and name.endswith(".pkl"):
+            zone = name[len("scaler_"):-len(".pkl")]
+            scalers[zone] = joblib.load(os.path.join(model_dir, name))
+            model_path = os.path.join(model_dir, f"model_{zone}.pkl")
+            if os.path.exists(model_path):
+                export_booster(joblib.load(model_path), model_dir, zone)
+                exported.append(zone)
+    write_preprocessing(os.path.join(model_dir, PREPROCESSING_NAME), features, scalers)
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled zone models, or switch the served model version.")
+    parser.add_argument("model_dir", nargs="?", default="models")
+    parser.add_argument("--publish", metavar="VERSION", help="Make VERSION current (e.g. to roll back) instead of converting")
+    args = parser.parse_args()
+
+    if args.publish:
+        publish_version(args.model_dir, args.publish)
+        print(f"✅ '{args.model_dir}' now serves version {args.publish}")
+    else:
+        # Convert existing pickles in the served version (or the flat directory)
+        target, _ = resolve_model_dir(args.model_dir)
+        zones = export_model_dir(target)
+        manifest = read_manifest(target)
+        if manifest is not None:
+            write_manifest(target, manifest)  # the exported files changed
+        print(f"✅ Exported boosters for {zones} and {PREPROCESSING_NAME} to '{target}'")
@@ -0,0 +1,224 @@
+import importlib.util
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from model_artifacts import (
+    PREPROCESSING_NAME, booster_path, load_booster, load_preprocessing, read_manifest, resolve_model_dir,
+    trees_path, verify_manifest,
+)
+from tree_ensemble import TreeEnsemble
+from zones import ZONES, get_risk_zone
+
+logger = logging.getLogger("earthquake_api")
+
+# -------------------------------
+# Per-zone model registry
+# -------------------------------
+# Loads every zone model produced by train_specialized.py once, so requests
+# never touch the disk. The flattened ensembles (model_<zone>.trees.npz), then
+# the native boosters (model_<zone>.ubj), together with preprocessing.npy are
+# preferred because they load without unpickling sklearn objects. The
+# flattened ensembles are evaluated in NumPy without importing xgboost, which
+# is faster for a handful of rows but several times slower than the native
+# booster from a few dozen rows on. The default "numpy" evaluator keeps
+# xgboost (and the sklearn/pandas it pulls in) out of serving workers and
+# holds one model per zone. Opt-in "auto" keeps both: batches of up to
+# `numpy_max_rows` rows use the NumPy ensemble, larger ones the booster (NumPy
+# only when xgboost is not installed); "xgboost" uses the boosters alone.
+# The joblib pickles are used when neither file is present.
+# Zones without a trained model are served by the 'other' model; if that is
+# missing too, the zone has no model and callers fall back to the formula.
+# In a versioned model directory the version named by CURRENT is loaded; a
+# registry never changes once loaded, so a new version means a new registry.
+
+FALLBACK_ZONE = 'other'
+EVALUATORS = ("auto", "numpy", "xgboost")
+SMOKE_DEPTHS = np.array([1.0, 5.0, 10.0, 33.0, 70.0, 150.0, 300.0, 700.0])
+
+
+def xgboost_available() -> bool:
+    """Whether xgboost is installed, without paying for importing it."""
+    return importlib.util.find_spec("xgboost") is not None
+
+
+def time_features(when: datetime = None) -> dict:
+    """
+    Calendar features in the same form train_specialized.py derives them from event times.
+    """
+    when = when or datetime.now(timezone.utc)
+    return {
+        'year': when.year,
+        'month_sin': np.sin(2 * np.pi * when.month / 12),
+        'month_cos': np.cos(2 * np.pi * when.month / 12),
+        'day': when.day,
+        'hour': when.hour,
+    }
+
+
+def scale(scaler, X: np.ndarray) -> np.ndarray:
+    """
+    Apply a fitted scaler. MinMaxScaler (what training uses) is applied from its
+    parameters directly, which skips sklearn's per-call validation and the
+    feature-name check against the DataFrame it was fitted on.
+    """
+    if hasattr(scaler, "scale_") and hasattr(scaler, "min_"):
+        return X * scaler.scale_ + scaler.min_
+    return scaler.transform(X)
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: str, evaluator: str = "numpy", numpy_max_rows: int = 8):
+        # "numpy" only uses the flattened ensembles, "xgboost" only the .ubj boosters
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"Unknown model evaluator {evaluator!r}; expected one of {EVALUATORS}")
+        self.model_dir = model_dir
+        self.evaluator = evaluator
+        self.numpy_max_rows = numpy_max_rows
+        self.path = model_dir  # directory the artifacts were read from
+        self.version = None    # None for a flat model directory
+        self.manifest = None
+        self.features = []
+        self.models = {}   # zone -> fitted regressor
+        self.small_batch_models = {}  # zone -> TreeEnsemble for batches of up to numpy_max_rows ("auto")
+        self.scalers = {}  # zone -> fitted scaler
+        self.routes = {}   # requested zone -> zone whose model serves it
+        self.format = None
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.routes)
+
+    def load(self) -> "ModelRegistry":
+        """
+        Load all available artifacts. Missing files are skipped with a warning
+        rather than failing startup.
+        """
+        self.path, self.version = resolve_model_dir(self.model_dir)
+        self.manifest = read_manifest(self.path)
+        preprocessing_path = os.path.join(self.path, PREPROCESSING_NAME)
+        if os.path.exists(preprocessing_path):
+            self._load_native(preprocessing_path)
+        else:
+            self._load_pickles()
+        if not self.features:
+            return self
+
+        for zone in ZONES:
+            if zone in self.models:
+                self.routes[zone] = zone
+            elif FALLBACK_ZONE in self.models:
+                self.routes[zone] = FALLBACK_ZONE
+        missing = [zone for zone in ZONES if zone not in self.routes]
+        logger.info("Loaded zone models (%s, version %s): %s", self.format, self.version or "unversioned", sorted(self.models))
+        if missing:
+            logger.warning("No model (and no '%s' fallback) for zones: %s", FALLBACK_ZONE, missing)
+        return self
+
+    def _load_native(self, preprocessing_path: str) -> None:
+        self.features, scalers = load_preprocessing(preprocessing_path)
+        use_boosters = self.evaluator == "xgboost" or (self.evaluator == "auto" and xgboost_available())
+        formats = set()
+        for zone in ZONES:
+            if zone not in scalers:
+                continue
+            flat_path, native_path = trees_path(self.path, zone), booster_path(self.path, zone)
+            has_flat = self.evaluator != "xgboost" and os.path.exists(flat_path)
+            if use_boosters and os.path.exists(native_path):
+                self.models[zone] = load_booster(native_path)
+                formats.add("ubj")
+                if has_flat and self.evaluator == "auto" and self.numpy_max_rows > 0:
+                    self.small_batch_models[zone] = TreeEnsemble.load(flat_path)
+                    formats.add("trees")
+            elif has_flat:
+                self.models[zone] = TreeEnsemble.load(flat_path)
+                formats.add("trees")
+            elif os.path.exists(native_path):
+                self.models[zone] = load_booster(native_path)
+                formats.add("ubj")
+            else:
+                continue
+            self.scalers[zone] = scalers[zone]
+        self.format = "+".join(sorted(formats)) or None
+
+    def _load_pickles(self) -> None:
+        try:
+            import joblib
+        except ImportError:
+            logger.warning("joblib is not installed; ML prediction mode is disabled.")
+            return
+
+        features_path = os.path.join(self.path, "features.pkl")
+        if not os.path.exists(features_path):
+            logger.warning("No features.pkl in %s; ML prediction mode is disabled.", self.path)
+            return
+        self.features = list(joblib.load(features_path))
+
+        for zone in ZONES:
+            model_path = os.path.join(self.path, f"model_{zone}.pkl")
+            scaler_path = os.path.join(self.path, f"scaler_{zone}.pkl")
+            if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+                continue
+            self.models[zone] = joblib.load(model_path)
+            self.scalers[zone] = joblib.load(scaler_path)
+        self.format = "pickle"
+
+    def route(self, latitude: float, longitude: float) -> tuple[str, str]:
+        """
+        Return (risk zone, zone of the model that serves it or None).
+        """
+        zone = get_risk_zone(latitude, longitude)
+        return zone, self.routes.get(zone)
+
+    def feature_matrix(self, depths, when: datetime = None) -> np.ndarray:
+        columns = {'depth': np.asarray(depths, dtype=np.float64), **time_features(when)}
+        n = len(columns['depth'])
+        return np.column_stack([np.broadcast_to(np.asarray(columns[name], dtype=np.float64), n) for name in self.features])
+
+    def predict(self, model_zone: str, depths, when: datetime = None) -> np.ndarray:
+        """
+        Predict magnitudes for rows that all route to the same model.
+        """
+        X = scale(self.scalers[model_zone], self.feature_matrix(depths, when))
+        model = self.models[model_zone]
+        if len(X) <= self.numpy_max_rows and model_zone in self.small_batch_models:
+            model = self.small_batch_models[model_zone]
+        if hasattr(model, "inplace_predict"):  # native xgboost Booster
+            return model.inplace_predict(X)
+        return model.predict(X)  # TreeEnsemble or pickled XGBRegressor
+
+    def validate(self, depths=SMOKE_DEPTHS) -> None:
+        """
+        Check the loaded files against the manifest and score a smoke batch with
+        every model (both evaluators under "auto"); raises ValueError unless each
+        returns one finite, plausible magnitude per row.
+        """
+        problems = verify_manifest(self.path)
+        if not self.loaded:
+            problems.append("no zone models could be loaded")
+        batches = [np.resize(depths, self.numpy_max_rows), np.resize(depths, self.numpy_max_rows + 1)] \
+            if self.small_batch_models else [depths]
+        for zone in sorted(self.models):
+            for batch in batches:
+                try:
+                    predictions = np.asarray(self.predict(zone, batch), dtype=np.float64)
+                except Exception as exc:
+                    problems.append(f"{zone}: {type(exc).__name__}: {exc}")
+                    break
+                if predictions.shape != (len(batch),):
+                    problems.append(f"{zone}: expected {len(batch)} predictions, got shape {predictions.shape}")
+                    break
+                if not np.all(np.isfinite(predictions)) or predictions.min() < 0 or predictions.max() > 10:
+                    problems.append(f"{zone}: implausible magnitudes {np.round(predictions, 2).tolist()}")
+                    break
+        if problems:
+            raise ValueError(f"Model version {self.version or self.path} failed validation: " + "; ".join(problems))
+
+    def snapshot(self) -> dict:
+        return {
+            "model_dir": self.model_dir, "version": self.version, "path": self.path, "evaluator": self.evaluator,
+            "numpy_max_rows": self.numpy_max_rows if self.small_batch_models else None,
+            "format": self.format, "features": self.features, "models": sorted(self.models), "routes": self.routes,
+        }
@@ -1,39 +1,37 @@
-import joblib
-import pandas as pd
 import numpy as np
 import time
+from datetime import datetime, timezone
+
+from zones import assign_zones, get_risk_zone  # noqa: F401 (get_risk_zone re-exported for callers)
+
+# 1. Load the saved components on first use. joblib (and through it sklearn and
+# xgboost) and pandas are imported lazily, so importing this module is cheap and never exits
+MODEL_PATH = "final_reg_model.pkl"
+SCALER_PATH = "scaler.pkl"
+FEATURES_PATH = "features.pkl"
+
+_components = None
+
+
+def load_components(model_path=MODEL_PATH, scaler_path=SCALER_PATH, features_path=FEATURES_PATH):
+    """
+    Load (and cache) the regression model, scaler and feature list.
+    Raises FileNotFoundError if any of the .pkl files is missing.
+    """
+    global _components
+    if _components is None:
+        import joblib
+
+        print("Loading model, scaler, and features...")
+        # Make sure these are the new models from the updated training script
+        _components = {
+            "reg_model": joblib.load(model_path),
+            "scaler": joblib.load(scaler_path),
+            "features": list(joblib.load(features_path)),  # Load the feature list
+        }
+        print("✅ Components loaded successfully.")
+    return _components
 
-# 1. Load all the saved components
-print("Loading model, scaler, and features...")
-try:
-    # Make sure these are the new models from the updated training script
-    reg_model = joblib.load("final_reg_model.pkl")
-    scaler = joblib.load("scaler.pkl")
-    features = joblib.load("features.pkl") # Load the feature list
-    print("✅ Components loaded successfully.")
-except FileNotFoundError as e:
-    print(f"❌ Error: A model, scaler, or encoder file is missing. {e}")
-    print("Please ensure all .pkl files from the training script are in the same directory.")
-    exit()
-
-# --- Replicate the risk zone function from training ---
-def get_risk_zone(lat, lon):
-    # Zone 1: Himalayan Belt (High Risk)
-    if 28 <= lat <= 36 and 73 <= lon <= 88:
-        return 'himalayan_belt'
-    # Zone 2: Andaman & Nicobar Islands (High Risk)
-    if 6 <= lat <= 14 and 92 <= lon <= 94:
-        return 'andaman_nicobar'
-    # Zone 3: Kutch Region, Gujarat (High Risk)
-    if 22 <= lat <= 24 and 68 <= lon <= 72:
-        return 'kutch_region'
-    # Zone 4: Indo-Gangetic Plain (Medium Risk)
-    if 24 <= lat <= 30 and 75 <= lon <= 88:
-        return 'indo_gangetic_plain'
-    # Zone 5: Peninsular India (Low Risk)
-    if 8 <= lat <= 22 and 72 <= lon <= 85:
-        return 'peninsular_india'
-    return 'other'
 
 # --- Replicate the risk assignment function from training ---
 def assign_risk(magnitude):
@@ -41,58 +39,91 @@ def assign_risk(magnitude):
     if magnitude >= 5.0: return 'Medium'
     return 'Low'
 
-# 2. Create a function to make predictions
+
+def assign_risk_many(magnitudes):
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+    return np.select([magnitudes >= 6.0, magnitudes >= 5.0], ['High', 'Medium'], default='Low').astype(object)
+
+
+def build_feature_matrix(latitude, longitude, depth, features, when=None):
+    """
+    Engineer the training features for many points at once, as a 2-D array in `features` order.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    depth = np.asarray(depth, dtype=np.float64)
+    n = len(latitude)
+
+    # Time features are taken from a single timestamp for the whole batch
+    now = when if when is not None else datetime.now(timezone.utc)
+    scalar_columns = {
+        'year': now.year,
+        'day': now.day,
+        'hour': now.hour,
+        'month_sin': np.sin(2 * np.pi * now.month / 12),
+        'month_cos': np.cos(2 * np.pi * now.month / 12),
+    }
+    array_columns = {'latitude': latitude, 'longitude': longitude, 'depth': depth}
+
+    zones = assign_zones(latitude, longitude)
+    X = np.empty((n, len(features)), dtype=np.float64)
+    for j, col in enumerate(features):
+        if col in array_columns:
+            X[:, j] = array_columns[col]
+        elif col in scalar_columns:
+            X[:, j] = scalar_columns[col]
+        elif col.startswith('zone_'):
+            # One-hot: 1 for the row's zone, 0 otherwise
+            X[:, j] = zones == col[len('zone_'):]
+        else:
+            raise KeyError(f"Don't know how to build feature '{col}'")
+    return X
+
+
+# 2. Create functions to make predictions
+def predict_many(latitude, longitude, depth, when=None):
+    """
+    Predicts earthquake risk for arrays of points in one vectorized pass.
+    Returns a dict of arrays: predicted_magnitude and predicted_risk_category.
+    """
+    features = load_components()["features"]
+    return predict_matrix(build_feature_matrix(latitude, longitude, depth, features, when))
+
+
+def predict_matrix(X):
+    """
+    predict_many for a feature matrix that is already built (in the loaded feature order).
+    """
+    components = load_components()
+    features, scaler = components["features"], components["scaler"]
+
+    # Scalers fitted on a DataFrame expect the same column names back
+    if hasattr(scaler, "feature_names_in_"):
+        import pandas as pd
+        X = pd.DataFrame(X, columns=features)
+    scaled_data = scaler.transform(X)
+
+    magnitude_pred = np.asarray(components["reg_model"].predict(scaled_data), dtype=np.float64)
+    return {
+        "predicted_magnitude": np.round(magnitude_pred, 2),
+        "predicted_risk_category": assign_risk_many(magnitude_pred),
+    }
+
+
 def predict_risk(latitude, longitude, depth):
     """
     Predicts earthquake risk from raw input data.
     """
     try:
-        # --- Step A: Create a dictionary with the raw inputs ---
-        # Using a dictionary first is cleaner for single predictions
-        input_dict = {
-            'latitude': float(latitude),
-            'longitude': float(longitude),
-            'depth': float(depth)
-        }
-
-        # --- Step B: Engineer all features to match training ---
-        now = pd.to_datetime('now', utc=True)
-        input_dict['year'] = now.year
-        input_dict['day'] = now.day
-        input_dict['hour'] = now.hour
-        input_dict['month_sin'] = np.sin(2 * np.pi * now.month / 12)
-        input_dict['month_cos'] = np.cos(2 * np.pi * now.month / 12)
-        
-        # --- Step C: Create and one-hot encode the risk zone ---
-        # This is the corrected logic
-        risk_zone = get_risk_zone(input_dict['latitude'], input_dict['longitude'])
-        for col in features:
-            if col.startswith('zone_'):
-                # Set the correct zone to 1, others will be 0 by default
-                if col == f'zone_{risk_zone}':
-                    input_dict[col] = 1
-                else:
-                    input_dict[col] = 0
-        
-        # --- Step D: Create the final DataFrame in the correct order ---
-        # This logic now perfectly matches the robust implementation in app.py
-        final_df = pd.DataFrame([input_dict])[features]
-        final_data = final_df # Keep variable name for consistency below
-
-        # --- Step E: Scale the data ---
-        scaled_data = scaler.transform(final_data)
-
-        # --- Step F: Make predictions using the scaled data ---
-        # 1. Predict the magnitude
-        magnitude_pred = reg_model.predict(scaled_data)[0].item()
-
-        # 2. Determine risk from the predicted magnitude
-        risk_pred = assign_risk(magnitude_pred)
+        features = load_components()["features"]
+        X = build_feature_matrix([latitude], [longitude], [depth], features)
+        result = predict_matrix(X)  # scored from the same row that is reported back
+        input_features = X[0]
 
         return {
-            "predicted_magnitude": round(magnitude_pred, 2),
-            "predicted_risk_category": risk_pred,
-            "input_features": final_data.to_dict('records')[0]
+            "predicted_magnitude": float(result["predicted_magnitude"][0]),
+            "predicted_risk_category": result["predicted_risk_category"][0],
+            "input_features": dict(zip(features, input_features.tolist()))
         }
 
     except Exception as e:
@@ -100,6 +131,13 @@ def predict_risk(latitude, longitude, depth):
 
 # 3. Example Usage
 if __name__ == '__main__':
+    try:
+        load_components()
+    except FileNotFoundError as e:
+        print(f"❌ Error: A model, scaler, or encoder file is missing. {e}")
+        print("Please ensure all .pkl files from the training script are in the same directory.")
+        exit()
+
     print("\n--- Running Test Predictions ---")
 
     # Test Case 1: Low Risk (Peninsular India)
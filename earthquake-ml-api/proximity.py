@@ -0,0 +1,172 @@
+import csv
+import json
+import logging
+import os
+
+import numpy as np
+
+from seismic_store import EARTH_RADIUS_KM
+
+logger = logging.getLogger("earthquake_api")
+
+# -------------------------------
+# Nearest-hotspot index
+# -------------------------------
+# Hotspots (or fault-segment points) are stored as unit vectors on the sphere
+# in a KD-tree. The straight-line (chord) distance between unit vectors grows
+# monotonically with the great-circle distance, so the nearest neighbour by
+# chord is also the nearest by great circle, and converting the chord back
+# gives the distance in km. Queries stay O(log n) as the catalogue grows.
+# scipy is a serving dependency. Without it, a small catalogue (up to
+# MAX_SCAN_POINTS) falls back to a vectorized brute-force scan with the same
+# answers, and a larger one is refused at load time, because every query
+# would then scan every point.
+# A catalogue is either a CSV of points or a GeoJSON file of fault traces
+# (LineString/MultiLineString features, e.g. the GEM Global Active Faults
+# database). Traces are densified into points every `spacing_km` along the
+# great circle between their vertices, so the distance to the nearest point
+# is within spacing_km / 2 of the distance to the trace itself.
+
+MAX_SCAN_POINTS = 2000
+HOTSPOTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hotspots.csv")
+
+
+def to_unit_vectors(latitude, longitude) -> np.ndarray:
+    lat, lon = np.radians(np.asarray(latitude, dtype=np.float64)), np.radians(np.asarray(longitude, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def densify_trace(coordinates, spacing_km: float) -> np.ndarray:
+    """
+    Unit vectors along a polyline of [lon, lat, ...] vertices, at most
+    `spacing_km` apart, interpolated along the great circle of each segment.
+    """
+    vertices = to_unit_vectors([c[1] for c in coordinates], [c[0] for c in coordinates])
+    if len(vertices) < 2:
+        return vertices
+    start, end = vertices[:-1], vertices[1:]
+    angle = np.arccos(np.clip(np.einsum("ij,ij->i", start, end), -1.0, 1.0))
+    steps = np.maximum(1, np.ceil(angle * EARTH_RADIUS_KM / spacing_km).astype(np.int64))
+    segment = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[segment]
+    theta = angle[segment]
+    sin_theta = np.sin(theta)
+    # Spherical interpolation; coincident vertices (theta = 0) fall back to the start point
+    safe = np.where(sin_theta > 1e-12, sin_theta, 1.0)
+    a = np.where(sin_theta > 1e-12, np.sin((1 - t) * theta) / safe, 1.0)
+    b = np.where(sin_theta > 1e-12, np.sin(t * theta) / safe, 0.0)
+    points = a[:, None] * start[segment] + b[:, None] * end[segment]
+    return np.vstack([points, vertices[-1:]])
+
+
+def to_lat_lon(points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return np.degrees(np.arcsin(np.clip(points[:, 2], -1.0, 1.0))), np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+
+
+class HotspotIndex:
+    def __init__(self, names: list, latitude, longitude):
+        if len(names) == 0:
+            raise ValueError("A hotspot index needs at least one hotspot")
+        self.names = list(names)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self._points = to_unit_vectors(self.latitude, self.longitude)
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            if len(self.names) > MAX_SCAN_POINTS:
+                raise ImportError(
+                    f"scipy is required for a hotspot catalogue of {len(self.names)} points "
+                    f"(more than {MAX_SCAN_POINTS}); install it with `pip install scipy`."
+                ) from None
+            logger.warning("scipy is not installed; hotspot proximity uses a brute-force scan.")
+            self._tree = None
+        else:
+            self._tree = cKDTree(self._points)
+
+    @classmethod
+    def from_csv(cls, path: str = HOTSPOTS_PATH) -> "HotspotIndex":
+        """
+        Load a catalogue with `name`, `latitude` and `longitude` columns.
+        """
+        names, lats, lons = [], [], []
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                names.append(row["name"])
+                lats.append(float(row["latitude"]))
+                lons.append(float(row["longitude"]))
+        return cls(names, lats, lons)
+
+    @classmethod
+    def from_geojson(cls, path: str, spacing_km: float = 10.0) -> "HotspotIndex":
+        """
+        Load fault traces (LineString/MultiLineString features; Point features
+        are kept as they are), densified every `spacing_km`. Each point is named
+        after its feature's `name` property, or the feature index.
+        """
+        with open(path, encoding="utf-8") as f:
+            features = json.load(f).get("features", [])
+        names, chunks = [], []
+        for i, feature in enumerate(features):
+            geometry = feature.get("geometry") or {}
+            kind, coordinates = geometry.get("type"), geometry.get("coordinates")
+            if kind == "Point":
+                lines = [[coordinates]]
+            elif kind == "LineString":
+                lines = [coordinates]
+            elif kind == "MultiLineString":
+                lines = coordinates
+            else:
+                continue
+            name = (feature.get("properties") or {}).get("name") or f"fault {i}"
+            for line in lines:
+                if line:
+                    points = densify_trace(line, spacing_km)
+                    chunks.append(points)
+                    names.extend([name] * len(points))
+        if not chunks:
+            raise ValueError(f"No fault traces in {path}")
+        lats, lons = to_lat_lon(np.vstack(chunks))
+        return cls(names, lats, lons)
+
+    @classmethod
+    def load(cls, path: str = HOTSPOTS_PATH, spacing_km: float = 10.0) -> "HotspotIndex":
+        """A CSV of points, or a .geojson/.json file of fault traces."""
+        if path.lower().endswith((".geojson", ".json")):
+            return cls.from_geojson(path, spacing_km)
+        return cls.from_csv(path)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def nearest(self, latitude, longitude) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Great-circle distance in km to the nearest hotspot and that hotspot's
+        index, for a single point or for arrays of points.
+        """
+        queries = to_unit_vectors(latitude, longitude)
+        if self._tree is not None:
+            chord, index = self._tree.query(queries)
+        else:
+            flat = queries.reshape(-1, 3)
+            chord = np.empty(len(flat))
+            index = np.empty(len(flat), dtype=np.intp)
+            for start in range(0, len(flat), 4096):  # bounds the (points × hotspots) matrix
+                d = np.linalg.norm(flat[start:start + 4096, None, :] - self._points[None, :, :], axis=-1)
+                index[start:start + 4096] = d.argmin(axis=1)
+                chord[start:start + 4096] = d[np.arange(len(d)), index[start:start + 4096]]
+            chord, index = chord.reshape(queries.shape[:-1]), index.reshape(queries.shape[:-1])
+        return chord_to_km(chord), index
+
+    def nearest_km(self, latitude, longitude):
+        distance, _ = self.nearest(latitude, longitude)
+        return float(distance) if np.ndim(distance) == 0 else distance
+
+    def nearest_name(self, latitude: float, longitude: float) -> tuple[str, float]:
+        distance, index = self.nearest(latitude, longitude)
+        return self.names[int(index)], float(distance)
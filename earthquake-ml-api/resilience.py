@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# Circuit breaker and stale-value cache
+# -------------------------------
+# CircuitBreaker stops calls to an upstream after `failure_threshold`
+# consecutive failures. While open, calls are rejected at once. After
+# `reset_after` seconds a single probe call is let through: success closes the
+# circuit, failure opens it again for another period. A probe that never
+# reports back (e.g. it was cancelled) is replaced after another `reset_after`.
+#
+# StaleCache remembers the last good value per key together with when it was
+# stored. The caller decides what counts as fresh, so one entry can be served
+# as fresh, then as stale while a refresh runs, and finally dropped at
+# `max_age`.
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_at = None
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_after:
+            self.state, self._probe_at = "half_open", None
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and (self._probe_at is None or now - self._probe_at >= self.reset_after):
+            self._probe_at = now
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state, self.failures, self._probe_at = "closed", 0, None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.stats["opened"] += 1
+            self.state, self.opened_at, self._probe_at = "open", time.monotonic(), None
+
+    def retry_after(self) -> float:
+        """
+        Seconds until allow() can let a call through again (0 while closed).
+        """
+        if self.state == "closed":
+            return 0.0
+        since = self.opened_at if self.state == "open" else self._probe_at
+        if since is None:
+            return 0.0
+        return max(0.0, self.reset_after - (time.monotonic() - since))
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, **self.stats}
+
+
+class StaleCache:
+    def __init__(self, max_entries: int = 4096, max_age: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+
+    def get(self, key):
+        """
+        Return (value, age in seconds), or None if the key is unknown or older than max_age.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age >= self.max_age:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1], age
+
+    def put(self, key, value) -> None:
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class BackgroundTasks:
+    """
+    Fire-and-forget coroutines that are kept referenced until they finish and
+    whose exceptions are marked as retrieved (they are reported elsewhere).
+    """
+
+    def __init__(self):
+        self._tasks = set()
+
+    def spawn(self, awaitable) -> asyncio.Future:
+        task = asyncio.ensure_future(awaitable)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    def __len__(self) -> int:
+        return len(self._tasks)
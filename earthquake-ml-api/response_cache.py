@@ -0,0 +1,92 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# Prediction response cache
+# -------------------------------
+# Serialized /predict responses kept in a bounded LRU. Every entry carries
+# an absolute expiry chosen by the caller, because how long an answer stays
+# valid depends on where its activity score came from. The ETag is a hash of
+# the body, so every worker hands out the same tag for the same answer, and
+# a client can revalidate against a worker that never saw its first request.
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    True if an If-None-Match header value names `etag` (weak tags compare equal).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "expires_at", "value")
+
+    def __init__(self, body: bytes, expires_at: float, value=None):
+        self.body = body
+        self.etag = body_etag(body)
+        self.expires_at = expires_at
+        self.value = value  # the object `body` was serialized from, for callers that need to vary it
+
+    def max_age(self) -> int:
+        return max(0, int(self.expires_at - time.time()))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 4096, depth_step: float = 0.5):
+        self.max_entries = max_entries
+        self.depth_step = depth_step
+        self._entries = OrderedDict()  # key -> CachedResponse
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0}
+
+    def depth_bucket(self, depth: float):
+        """
+        Depths within the same `depth_step` share an entry; a step of 0 keeps exact depths.
+        """
+        if self.depth_step <= 0:
+            return depth
+        return int(round(depth / self.depth_step))
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, key, body: bytes, ttl: float, value=None) -> CachedResponse:
+        """
+        Store `body` for `ttl` seconds and return the entry; a ttl of 0 or less
+        builds the entry (for its ETag) without caching it.
+        """
+        entry = CachedResponse(body, time.time() + max(0.0, ttl), value)
+        if ttl <= 0 or self.max_entries <= 0:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "depth_step": self.depth_step, **self.stats}
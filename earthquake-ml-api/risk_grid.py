@@ -0,0 +1,228 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from seismic_store import EARTH_RADIUS_KM, KM_PER_DEGREE
+
+# -------------------------------
+# Precomputed global risk grid
+# -------------------------------
+# The rule-based magnitude formula is evaluated once for every cell of a
+# regular lat/lon grid (row 0 = northernmost band) at a reference depth, using
+# the activity score each cell would get from the local event store. The
+# result is saved as a float16 .npy file that every worker memory-maps, and
+# map tiles are cut from it on demand: a tile is a 256×256 gather from the
+# grid, so no geocoding or USGS round trip is involved.
+#
+# Tiles are uint8 magnitude codes: 0 = no data, otherwise
+# magnitude = (code - 1) * MAX_MAGNITUDE / 254. They are served either raw
+# ("bin") or as a palette PNG coloured by risk band.
+
+TILE_SIZE = 256
+MAX_MAGNITUDE = 9.5
+TILE_CACHE_SIZE = 1024
+
+# Colours for the risk bands of main.calculate_risk, matching RiskMap.jsx
+RISK_BANDS = [
+    (7.0, (0xE7, 0x4C, 0x3C)),  # Severe
+    (6.0, (0xE6, 0x7E, 0x22)),  # High
+    (5.0, (0xF1, 0xC4, 0x0F)),  # Moderate
+    (0.0, (0x2E, 0xCC, 0x71)),  # Low
+]
+
+
+def grid_axes(resolution: float) -> tuple[np.ndarray, np.ndarray]:
+    """Cell-centre latitudes (north to south) and longitudes (west to east)."""
+    n_rows, n_cols = int(round(180 / resolution)), int(round(360 / resolution))
+    lats = 90.0 - (np.arange(n_rows) + 0.5) * resolution
+    lons = -180.0 + (np.arange(n_cols) + 0.5) * resolution
+    return lats, lons
+
+
+def activity_grid(lats, lons, event_lat, event_lon, event_mag, radius_km: float = 250) -> np.ndarray:
+    """
+    Per-cell activity score with the same normalization as
+    SeismicEventStore.activity_score: known magnitudes of the events within
+    `radius_km` of the cell centre, summed and divided by twice the number of
+    events, capped at 3.0. Each event is stamped onto the cells around it.
+    """
+    resolution = float(lats[0] - lats[1]) if len(lats) > 1 else 180.0
+    n_rows, n_cols = len(lats), len(lons)
+    total = np.zeros((n_rows, n_cols))
+    count = np.zeros((n_rows, n_cols), dtype=np.int32)
+    dlat = radius_km / KM_PER_DEGREE
+    lat_rad = np.radians(lats)
+
+    for e_lat, e_lon, mag in zip(event_lat, event_lon, np.nan_to_num(event_mag)):
+        row_lo = max(int((90.0 - (e_lat + dlat)) // resolution), 0)
+        row_hi = min(int((90.0 - (e_lat - dlat)) // resolution), n_rows - 1)
+        rows = np.arange(row_lo, row_hi + 1)
+        widest = min(max(abs(e_lat - dlat), abs(e_lat + dlat)), 90.0)
+        dlon = dlat / np.cos(np.radians(widest)) if widest < 89.0 else 180.0
+        if dlon >= 180.0:
+            cols = np.arange(n_cols)
+        else:
+            first = int((e_lon - dlon + 180.0) // resolution)
+            cols = np.unique((first + np.arange(int(np.ceil(2 * dlon / resolution)) + 2)) % n_cols)
+
+        # Haversine from the event to every cell centre in its bounding box
+        phi, lam = np.radians(e_lat), np.radians(e_lon)
+        a = (np.sin((lat_rad[rows, None] - phi) / 2) ** 2
+             + np.cos(phi) * np.cos(lat_rad[rows, None]) * np.sin((np.radians(lons[cols])[None, :] - lam) / 2) ** 2)
+        inside = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) <= radius_km
+        r, c = np.nonzero(inside)
+        total[rows[r], cols[c]] += mag
+        count[rows[r], cols[c]] += 1
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(count > 0, total / (count * 2.0), 0.0)
+    return np.minimum(score, 3.0)
+
+
+def build_grid(score_rows, resolution: float, depth_km: float, events: tuple, chunk_rows: int = 64) -> np.ndarray:
+    """
+    Evaluate `score_rows(lats, lons, depths, activity)` (the API's formula)
+    over the whole grid, `chunk_rows` latitude bands at a time.
+    `events` is the (latitude, longitude, magnitude) arrays from the store.
+    """
+    lats, lons = grid_axes(resolution)
+    activity = activity_grid(lats, lons, *events)
+    grid = np.empty((len(lats), len(lons)), dtype=np.float16)
+    for start in range(0, len(lats), chunk_rows):
+        band_lats = lats[start:start + chunk_rows]
+        lat2d, lon2d = np.meshgrid(band_lats, lons, indexing="ij")
+        magnitude = score_rows(lat2d.ravel(), lon2d.ravel(), np.full(lat2d.size, depth_km),
+                               activity[start:start + chunk_rows].ravel())["magnitude"]
+        grid[start:start + chunk_rows] = np.minimum(magnitude, MAX_MAGNITUDE).reshape(lat2d.shape)
+    return grid
+
+
+def write_grid(path: str, grid: np.ndarray) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npy"  # per-process name: workers may build concurrently
+    np.save(tmp, grid)
+    os.replace(tmp, path)
+
+
+def _palette() -> tuple[bytes, bytes]:
+    rgb, alpha = bytearray(3), bytearray(1)  # code 0: transparent
+    for code in range(1, 256):
+        magnitude = (code - 1) * MAX_MAGNITUDE / 254
+        rgb += bytes(next(color for floor, color in RISK_BANDS if magnitude >= floor))
+        alpha.append(int(90 + 130 * min(magnitude / MAX_MAGNITUDE, 1.0)))
+    return bytes(rgb), bytes(alpha)
+
+
+PALETTE_RGB, PALETTE_ALPHA = _palette()
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(codes: np.ndarray) -> bytes:
+    """8-bit palette PNG of a 2-D uint8 code array."""
+    height, width = codes.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)  # filter byte 0 per scanline
+    raw[:, 1:] = codes
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b"PLTE", PALETTE_RGB),
+        _png_chunk(b"tRNS", PALETTE_ALPHA),
+        _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def tile_indices(z: int, x: int, y: int, n_rows: int, n_cols: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Grid row and column of every pixel of a Web Mercator tile, plus a mask of
+    the pixels that fall inside the grid.
+    """
+    n = 2 ** z
+    pixel = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + pixel) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / n))))
+    rows = np.floor((90.0 - lats) / (180.0 / n_rows)).astype(np.intp)
+    cols = np.floor((lons + 180.0) / (360.0 / n_cols)).astype(np.intp)
+    valid = (rows >= 0) & (rows < n_rows)
+    return np.clip(rows, 0, n_rows - 1), np.clip(cols, 0, n_cols - 1), valid
+
+
+class RiskGrid:
+    """
+    Memory-mapped view of the grid file. The file is re-opened whenever its
+    size or mtime changes, so a grid rebuilt by any worker (or offline) is
+    picked up by all of them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._grid = None
+        self._stat = None
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current(self) -> tuple[np.ndarray, str]:
+        """Return (grid, version) or (None, None) if no grid has been built."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None, None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._stat:
+                self._grid = np.load(self.path, mmap_mode="r")
+                self._stat = key
+                self._tiles.clear()
+            return self._grid, f"{key[0]:x}-{key[1]:x}"
+
+    def age(self) -> float:
+        try:
+            return max(0.0, time.time() - os.stat(self.path).st_mtime)
+        except FileNotFoundError:
+            return float("inf")
+
+    def tile(self, z: int, x: int, y: int, fmt: str = "png") -> tuple[bytes, str]:
+        """Return (encoded tile, grid version). Raises LookupError if no grid exists yet."""
+        grid, version = self.current()
+        if grid is None:
+            raise LookupError("The risk grid has not been built yet")
+        key = (version, z, x, y, fmt)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key], version
+
+        rows, cols, valid = tile_indices(z, x, y, *grid.shape)
+        magnitude = np.asarray(grid[np.ix_(rows, cols)], dtype=np.float32)
+        codes = (np.rint(np.clip(magnitude, 0, MAX_MAGNITUDE) / MAX_MAGNITUDE * 254) + 1).astype(np.uint8)
+        codes[~valid] = 0
+        codes[np.isnan(magnitude)] = 0
+        body = encode_png(codes) if fmt == "png" else codes.tobytes()
+
+        with self._lock:
+            self._tiles[key] = body
+            if len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        return body, version
+
+    def snapshot(self) -> dict:
+        grid, version = self.current()
+        if grid is None:
+            return {"path": self.path, "built": False}
+        return {
+            "path": self.path,
+            "built": True,
+            "version": version,
+            "shape": list(grid.shape),
+            "resolution_deg": 180.0 / grid.shape[0],
+            "age_seconds": round(self.age(), 1),
+        }
+
@@ -0,0 +1,91 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from predict import load_components, predict_many
+
+# -------------------------------
+# Streaming batch scorer
+# -------------------------------
+# Scores a CSV or Parquet file of points with predict.predict_many, one chunk at
+# a time, so memory use depends on --chunksize and not on the input size.
+#
+#   python score_points.py grid.parquet scored.parquet --chunksize 500000
+#   python score_points.py points.csv scored.csv --lat-col lat --lon-col lon
+
+
+def read_chunks(path, chunksize, columns=None):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, chunksize=100_000, lat_col="latitude", lon_col="longitude",
+               depth_col="depth", keep_columns=True):
+    load_components()
+    # A single timestamp for the whole run, so every chunk gets the same time features
+    when = pd.to_datetime('now', utc=True)
+    columns = None if keep_columns else [lat_col, lon_col, depth_col]
+
+    writer = ChunkWriter(output_path)
+    rows, start = 0, time.time()
+    try:
+        for chunk in read_chunks(input_path, chunksize, columns):
+            result = predict_many(chunk[lat_col].to_numpy(), chunk[lon_col].to_numpy(), chunk[depth_col].to_numpy(), when)
+            chunk = chunk.assign(**result)
+            writer.write(chunk)
+            rows += len(chunk)
+            print(f"Scored {rows:,} rows ({rows / max(time.time() - start, 1e-9):,.0f} rows/s)")
+    finally:
+        writer.close()
+    print(f"✅ Wrote {rows:,} predictions to '{output_path}'")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of points with the regression model.")
+    parser.add_argument("input", help="Input .csv or .parquet file")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--lat-col", default="latitude")
+    parser.add_argument("--lon-col", default="longitude")
+    parser.add_argument("--depth-col", default="depth")
+    parser.add_argument("--only-scored-columns", action="store_true",
+                        help="Read and write only the coordinate/depth columns plus predictions")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        parser.error("input and output must be different files")
+    score_file(args.input, args.output, args.chunksize, args.lat_col, args.lon_col, args.depth_col,
+               keep_columns=not args.only_scored_columns)
@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+
+# -------------------------------
+# Local USGS event store
+# -------------------------------
+# Recent global events are kept as parallel NumPy columns sorted by grid cell.
+# A radius query only looks at the cells overlapping the search circle and
+# then filters the candidates by exact great-circle distance, which is the
+# same distance USGS uses for `maxradiuskm`.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 2 * np.pi * EARTH_RADIUS_KM / 360.0
+CELL_DEG = 2.0
+N_ROWS = int(180 / CELL_DEG)
+N_COLS = int(360 / CELL_DEG)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km. Accepts scalars or NumPy arrays.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _cell_rows(lat):
+    return np.clip(((np.asarray(lat) + 90.0) // CELL_DEG).astype(np.int64), 0, N_ROWS - 1)
+
+
+def _cell_cols(lon):
+    return (((np.asarray(lon) + 180.0) // CELL_DEG).astype(np.int64)) % N_COLS
+
+
+def parse_feed(geojson: dict) -> dict:
+    """
+    Convert a USGS GeoJSON FeatureCollection into columnar arrays.
+    Events with a missing magnitude are kept (as NaN) because they still count
+    towards the number of events in the activity score.
+    """
+    features = geojson.get("features", [])
+    n = len(features)
+    ids = np.empty(n, dtype=object)
+    lat = np.empty(n, dtype=np.float64)
+    lon = np.empty(n, dtype=np.float64)
+    mag = np.empty(n, dtype=np.float64)
+    when = np.empty(n, dtype=np.int64)
+    for i, event in enumerate(features):
+        props, coords = event["properties"], event["geometry"]["coordinates"]
+        ids[i] = event.get("id")
+        lon[i], lat[i] = coords[0], coords[1]
+        mag[i] = np.nan if props.get("mag") is None else props["mag"]
+        when[i] = props.get("time") or 0
+    return {"id": ids, "latitude": lat, "longitude": lon, "mag": mag, "time": when}
+
+
+class _Snapshot:
+    """
+    Immutable, cell-sorted copy of the event columns plus the grid offsets.
+    """
+
+    def __init__(self, columns: dict):
+        cells = _cell_rows(columns["latitude"]) * N_COLS + _cell_cols(columns["longitude"])
+        order = np.argsort(cells, kind="stable")
+        self.cells = cells[order]
+        self.latitude = columns["latitude"][order]
+        self.longitude = columns["longitude"][order]
+        self.mag = columns["mag"][order]
+        self.time = columns["time"][order]
+        self.size = len(order)
+
+    def candidates(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEGREE
+        lat_lo, lat_hi = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+        rows = np.arange(_cell_rows(lat_lo), _cell_rows(lat_hi) + 1)
+
+        widest = max(abs(lat_lo), abs(lat_hi))
+        if widest >= 89.0:
+            cols = np.arange(N_COLS)
+        else:
+            dlon = dlat / np.cos(np.radians(widest))
+            if dlon >= 180.0:
+                cols = np.arange(N_COLS)
+            else:
+                first = int(_cell_cols(longitude - dlon))
+                span = int(np.ceil(2 * dlon / CELL_DEG)) + 1
+                cols = (first + np.arange(min(span, N_COLS) + 1)) % N_COLS
+                cols = np.unique(cols)
+
+        wanted = (rows[:, None] * N_COLS + cols[None, :]).ravel()
+        starts = np.searchsorted(self.cells, wanted, side="left")
+        ends = np.searchsorted(self.cells, wanted, side="right")
+        hits = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+
+def snapshot_from_feed(geojson: dict) -> _Snapshot:
+    """
+    The indexed, picklable event columns of a GeoJSON feed, ready for SeismicEventStore.swap.
+    """
+    return _Snapshot(parse_feed(geojson))
+
+
+class SeismicEventStore:
+    def __init__(self, stale_after: float = 600.0):
+        self.stale_after = stale_after
+        self.updated_at = 0.0
+        self._snapshot = _Snapshot(parse_feed({}))
+
+    @property
+    def size(self) -> int:
+        return self._snapshot.size
+
+    def is_fresh(self) -> bool:
+        return self.updated_at > 0 and time.time() - self.updated_at < self.stale_after
+
+    def load(self, geojson: dict) -> None:
+        """
+        Replace the stored events with the contents of a GeoJSON feed.
+        """
+        self.swap(snapshot_from_feed(geojson))
+
+    def swap(self, snapshot: "_Snapshot") -> None:
+        """
+        Serve a snapshot built off to the side (possibly in another process).
+        It is swapped in with a single assignment, so concurrent readers
+        always see a consistent view.
+        """
+        self._snapshot = snapshot
+        self.updated_at = time.time()
+
+    def query(self, latitude: float, longitude: float, radius_km: float = 250, days: float = 30, now: float = None):
+        """
+        Return the magnitudes (NaN for unknown) of events within `radius_km`
+        of the point during the last `days` days.
+        """
+        snap = self._snapshot
+        idx = snap.candidates(latitude, longitude, radius_km)
+        if idx.size == 0:
+            return snap.mag[:0]
+        now = time.time() if now is None else now
+        cutoff_ms = (now - days * 86400) * 1000
+        keep = snap.time[idx] >= cutoff_ms
+        idx = idx[keep]
+        distance = haversine_km(latitude, longitude, snap.latitude[idx], snap.longitude[idx])
+        return snap.mag[idx[distance <= radius_km]]
+
+    def recent(self, days: float = 30, now: float = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (latitude, longitude, magnitude) of every event in the last `days` days.
+        """
+        snap = self._snapshot
+        now = time.time() if now is None else now
+        keep = snap.time >= (now - days * 86400) * 1000
+        return snap.latitude[keep], snap.longitude[keep], snap.mag[keep]
+
+    def activity_score(self, latitude: float, longitude: float, radius_km: float = 250, days: float = 30) -> float:
+        """
+        Same normalization as the live USGS lookup: sum of known magnitudes
+        divided by twice the number of events, capped at 3.0.
+        """
+        mags = self.query(latitude, longitude, radius_km, days)
+        if mags.size == 0:
+            return 0.0
+        score = float(np.nansum(mags)) / (mags.size * 2.0)
+        return min(score, 3.0)
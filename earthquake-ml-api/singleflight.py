@@ -0,0 +1,36 @@
+import asyncio
+
+# -------------------------------
+# Single-flight request coalescing
+# -------------------------------
+# Concurrent callers asking for the same key share one in-flight coroutine.
+# The first caller starts the work; everyone else awaits the same future and
+# receives the same result or exception. Nothing is cached once it settles.
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict = {}
+        self.stats = {"leaders": 0, "shared": 0}
+
+    async def do(self, key, factory):
+        """
+        Run `factory()` for `key`, or join the call already in flight for it.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["shared"] += 1
+            # shield: one joiner being cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        self.stats["leaders"] += 1
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Mark the exception as retrieved even if every waiter was cancelled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return await asyncio.shield(future)
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "inflight": len(self._inflight), **self.stats}
@@ -1,7 +1,8 @@
 import pandas as pd
 import requests
-import math
 import joblib
+import argparse
+import os
 from datetime import datetime, timedelta
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -10,6 +11,9 @@ from imblearn.over_sampling import SMOTE
 from imblearn.pipeline import Pipeline as ImbPipeline
 from sklearn.metrics import classification_report, accuracy_score
 
+from hyperparam_search import parameter_grid, sample_parameters, search, write_report
+from proximity import HOTSPOTS_PATH, HotspotIndex
+
 # --- Configuration ---
 # Fetches significant earthquakes (M4.5+) from the last year
 USGS_API_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
@@ -19,9 +23,21 @@ END_TIME = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
 MODEL_FILENAME = "earthquake_risk_model.pkl"
 SCALER_FILENAME = "data_scaler.pkl"
 
-# Define a major seismic hotspot (e.g., Japan Trench) for feature engineering
-HOTSPOT_LAT = 38.0
-HOTSPOT_LON = 143.0
+# Seismic hotspot catalogue for feature engineering (shared with the API, and
+# read from the same HOTSPOTS_PATH / HOTSPOTS_SPACING_KM settings)
+HOTSPOTS = HotspotIndex.load(
+    os.getenv("HOTSPOTS_PATH", HOTSPOTS_PATH), spacing_km=float(os.getenv("HOTSPOTS_SPACING_KM", "10"))
+)
+
+# Classifier settings used without a search, and the space --search explores
+CLASSIFIER_PARAMS = {'n_estimators': 100}
+CLASSIFIER_SEARCH_SPACE = {
+    'n_estimators': [100, 200, 400],
+    'max_depth': [None, 12, 24],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 0.5, 1.0],
+}
+SEARCH_SCORING = 'f1_macro'  # the risk classes are imbalanced; accuracy would favour "Low"
 
 # --- Helper Functions ---
 def fetch_usgs_data():
@@ -82,13 +98,42 @@ def classify_risk(magnitude):
 def add_engineered_features(df):
     """Adds new, more meaningful features to the DataFrame."""
     print("Engineering new features...")
-    # Calculate distance from a known seismic hotspot
-    df['distance_to_hotspot'] = df.apply(
-        lambda row: math.sqrt((row['latitude'] - HOTSPOT_LAT)**2 + (row['longitude'] - HOTSPOT_LON)**2), axis=1
-    )
+    # Great-circle distance (km) to the nearest known seismic hotspot
+    df['distance_to_hotspot'] = HOTSPOTS.nearest_km(df['latitude'].to_numpy(), df['longitude'].to_numpy())
     return df
 
-def train_and_save_model(df):
+def build_search_pipeline(params, n_jobs):
+    """
+    SMOTE + classifier for one search candidate. The search feeds it the
+    already-scaled training matrix, so there is no scaler step.
+    """
+    return ImbPipeline([
+        ('smote', SMOTE(random_state=42)),
+        ('classifier', RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=n_jobs, **params)),
+    ])
+
+
+def search_classifier_params(X_train, y_train, args):
+    """
+    Cross-validate candidate classifier settings on the training split; the
+    test split stays untouched for the final evaluation.
+    Returns the best parameters.
+    """
+    # Scaled once for every candidate and fold (a StandardScaler does not move tree splits)
+    X_scaled = StandardScaler().fit_transform(X_train)
+    if args.search == 'grid':
+        candidates = parameter_grid(CLASSIFIER_SEARCH_SPACE)
+    else:
+        candidates = sample_parameters(CLASSIFIER_SEARCH_SPACE, args.n_iter)
+    results = search(build_search_pipeline, candidates, X_scaled, y_train.to_numpy(), n_splits=args.folds,
+                     scoring=SEARCH_SCORING, max_workers=args.workers, label="risk classifier")
+    if args.report:
+        write_report(args.report, {"scoring": SEARCH_SCORING, "folds": args.folds, "results": results})
+        print(f"Search report saved as '{args.report}'")
+    return results[0]['params']
+
+
+def train_and_save_model(df, args=None):
     """Trains a classifier, scales the data, and saves the model and scaler."""
     if df.empty:
         print("DataFrame is empty. Cannot train model.")
@@ -109,6 +154,10 @@ def train_and_save_model(df):
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    classifier_params = CLASSIFIER_PARAMS
+    if args is not None and args.search:
+        classifier_params = search_classifier_params(X_train, y_train, args)
     
     # We will now use a pipeline to combine SMOTE and the classifier
     # This prevents data leakage from the validation set into the training set
@@ -116,7 +165,7 @@ def train_and_save_model(df):
     pipeline = ImbPipeline([
         ('scaler', StandardScaler()),
         ('smote', SMOTE(random_state=42)),
-        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced'))
+        ('classifier', RandomForestClassifier(random_state=42, class_weight='balanced', **classifier_params))
     ])
     
     # Train the pipeline
@@ -141,8 +190,18 @@ def train_and_save_model(df):
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the earthquake risk classifier.")
+    parser.add_argument("--search", choices=["grid", "random"],
+                        help="Pick the classifier settings by cross-validated search before the final fit")
+    parser.add_argument("--n-iter", type=int, default=20, help="Candidates sampled in random search")
+    parser.add_argument("--folds", type=int, default=5, help="Stratified folds per candidate")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("TRAIN_WORKERS", "0")) or None,
+                        help="Search processes (default: one per core)")
+    parser.add_argument("--report", help="Write every candidate's scores, timings and memory to this JSON file")
+    args = parser.parse_args()
+
     usgs_features = fetch_usgs_data()
     if usgs_features:
         earthquake_df = create_dataframe(usgs_features)
         if not earthquake_df.empty:
-            train_and_save_model(earthquake_df)
+            train_and_save_model(earthquake_df, args)
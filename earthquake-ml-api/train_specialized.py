@@ -2,122 +2,338 @@ import pandas as pd
 import numpy as np
 import requests
 import joblib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from sklearn.preprocessing import MinMaxScaler
 import xgboost as xgb
 import os
 
-print("--- Starting Specialized, Multi-Model Training Pipeline ---")
-
-def fetch_usgs_data(start_time, end_time, min_magnitude):
-    """Fetches earthquake data from the USGS API."""
-    usgs_api_url = "https://earthquake.usgs.gov/fdsnws/event/1/query"
-    params = {"format": "geojson", "starttime": start_time, "endtime": end_time, "minmagnitude": min_magnitude, "limit": 20000}
-    try:
-        print(f"Downloading data from {start_time} to {end_time}...")
-        response = requests.get(usgs_api_url, params=params)
-        response.raise_for_status()
-        print("Download complete.")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"❌ ERROR: Failed to download data. {e}")
-        return None
-
-def process_geojson_to_dataframe(data):
-    """Converts GeoJSON data to a pandas DataFrame."""
-    records = []
-    if not data or 'features' not in data: return pd.DataFrame()
-    for feature in data["features"]:
-        props, coords = feature["properties"], feature["geometry"]["coordinates"]
-        records.append({
-            "time": pd.to_datetime(props["time"], unit='ms', errors='coerce'),
-            "latitude": coords[1], "longitude": coords[0], "depth": coords[2],
-            "magnitude": props["mag"]
-        })
-    return pd.DataFrame(records)
-
-# --- 1. Data Fetching and Cleaning ---
-start_date, end_date, min_mag = "1990-01-01", datetime.now().strftime("%Y-%m-%d"), 2.5
-geojson_data = fetch_usgs_data(start_date, end_date, min_mag)
-
-if not geojson_data:
-    print("Could not fetch data. Exiting.")
-    exit()
-
-df = process_geojson_to_dataframe(geojson_data)
-df.dropna(subset=['time', 'magnitude', 'latitude', 'longitude', 'depth'], inplace=True)
-df.drop_duplicates(subset=['time', 'latitude', 'longitude', 'magnitude'], inplace=True)
-df.columns = [col.lower() for col in df.columns] # Standardize to lowercase
-print(f"\n✅ Dataset shape: {df.shape}")
-
-# --- 2. Feature Engineering ---
-print("\n🚀 Starting Feature Engineering...")
-def get_risk_zone(lat, lon):
-    if 28 <= lat <= 36 and 73 <= lon <= 88: return 'himalayan_belt'
-    if 6 <= lat <= 14 and 92 <= lon <= 94: return 'andaman_nicobar'
-    if 22 <= lat <= 24 and 68 <= lon <= 72: return 'kutch_region'
-    if 24 <= lat <= 30 and 75 <= lon <= 88: return 'indo_gangetic_plain'
-    if 8 <= lat <= 22 and 72 <= lon <= 85: return 'peninsular_india'
-    return 'other'
-
-df['zone'] = df.apply(lambda row: get_risk_zone(row['latitude'], row['longitude']), axis=1)
-
-df['year'] = df['time'].dt.year
-df['month_sin'] = np.sin(2 * np.pi * df['time'].dt.month/12)
-df['month_cos'] = np.cos(2 * np.pi * df['time'].dt.month/12)
-df['day'] = df['time'].dt.day
-df['hour'] = df['time'].dt.hour
-print("✅ Feature engineering complete.")
-
-# --- 3. Train and Save a Model for Each Zone ---
-print("\n🎯 Training specialized models for each geographic zone...")
+from hyperparam_search import parameter_grid, quantile_strata, sample_parameters, search, write_report
+from model_artifacts import (
+    PREPROCESSING_NAME, create_version, export_booster, prune_versions, publish_version, read_manifest,
+    resolve_model_dir, write_manifest, write_preprocessing,
+)
+from usgs_download import download_events
+from zones import ZONES, assign_zones
 
 features = ['depth', 'year', 'month_sin', 'month_cos', 'day', 'hour']
-zones = df['zone'].unique()
 # Ensure all possible zones are considered, even if not in the current dataset
-all_possible_zones = ['himalayan_belt', 'andaman_nicobar', 'kutch_region', 'indo_gangetic_plain', 'peninsular_india', 'other']
-
-# Create a 'models' directory if it doesn't exist to keep things clean
+all_possible_zones = ZONES
+MIN_ZONE_SAMPLES = 50
+# Each run writes a new version under models/versions/ and publishes it when complete
 output_dir = "models"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-for zone in all_possible_zones:
-    print(f"\n--- Training model for zone: {zone} ---")
-    
-    # If a zone has no data, train on the 'other' category as a fallback
-    if zone not in zones or len(df[df['zone'] == zone]) < 50:
-        if zone in zones:
-            print(f"⚠️ Insufficient data for zone '{zone}' ({len(df[df['zone'] == zone])} samples). Using 'other' data as a fallback.")
+KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+
+# Booster settings for a full training, and the space --search explores per zone
+XGB_PARAMS = {
+    "n_estimators": 500,
+    "learning_rate": 0.05,
+    "max_depth": 8,
+    "random_state": 42,
+    "reg_alpha": 0.1,  # Add a small regularization term
+}
+XGB_SEARCH_SPACE = {
+    "n_estimators": [200, 500, 800],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "max_depth": [4, 6, 8, 10],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+    "reg_alpha": [0.0, 0.1, 1.0],
+}
+SEARCH_SCORING = "neg_root_mean_squared_error"
+
+
+def load_dataset(start_date="1990-01-01"):
+    """Downloads (or reads from cache) and cleans the USGS catalogue."""
+    # Downloaded in month-sized windows (under the FDSN 20,000-event cap) and cached
+    # as Parquet, so re-runs only fetch windows that are new or still being revised
+    end_date, min_mag = datetime.now().strftime("%Y-%m-%d"), 2.5
+    cache_dir = os.getenv("USGS_CACHE_DIR", "usgs_cache")
+    df = download_events(start_date, end_date, min_mag, cache_dir=cache_dir, max_workers=int(os.getenv("USGS_DOWNLOAD_WORKERS", "4")))
+
+    df.dropna(subset=['time', 'magnitude', 'latitude', 'longitude', 'depth'], inplace=True)
+    df.drop_duplicates(subset=['time', 'latitude', 'longitude', 'magnitude'], inplace=True)
+    df.columns = [col.lower() for col in df.columns] # Standardize to lowercase
+    return df
+
+
+def add_features(df):
+    """Zone assignment and calendar features, computed column-wise."""
+    df['zone'] = assign_zones(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+
+    month = df['time'].dt.month
+    df['year'] = df['time'].dt.year
+    df['month_sin'] = np.sin(2 * np.pi * month/12)
+    df['month_cos'] = np.cos(2 * np.pi * month/12)
+    df['day'] = df['time'].dt.day
+    df['hour'] = df['time'].dt.hour
+    return df
+
+
+def plan_training(partitions):
+    """
+    Maps each data source to the zones whose model it trains. Zones with too
+    little data share the 'other' model, so it is fitted once and saved under
+    every fallback zone's name.
+    """
+    plan = {}
+    for zone in all_possible_zones:
+        n = len(partitions[zone]) if zone in partitions else 0
+        if n < MIN_ZONE_SAMPLES:
+            # If a zone has no data, train on the 'other' category as a fallback
+            if n:
+                print(f"⚠️ Insufficient data for zone '{zone}' ({n} samples). Using 'other' data as a fallback.")
+            else:
+                print(f"⚠️ No data for zone '{zone}'. Using 'other' data as a fallback.")
+            plan.setdefault('other', []).append(zone)
         else:
-            print(f"⚠️ No data for zone '{zone}'. Using 'other' data as a fallback.")
-        zone_df = df[df['zone'] == 'other']
-    else:
-        zone_df = df[df['zone'] == zone]
+            plan.setdefault(zone, []).append(zone)
+    return plan
+
+
+def build_regressor(params, n_jobs):
+    """The zone regressor with `params` over the defaults (also the search's estimator factory)."""
+    return xgb.XGBRegressor(**{**XGB_PARAMS, **params, "n_jobs": n_jobs})
+
 
-    X = zone_df[features]
-    y = zone_df['magnitude']
+def train_zone(source, target_zones, X, y, n_jobs, model_dir, continue_rounds=None, params=None):
+    """
+    Fits one scaler + XGBoost model and saves it in model_dir for each target zone. Runs in a worker process.
+    With `continue_rounds`, the existing model and scaler for the zone are loaded
+    instead and the model gets that many extra boosting rounds on X, y.
+    `params` (e.g. found by --search) override XGB_PARAMS for a new model.
+    """
+    if continue_rounds:
+        # Keep the fitted scaler: the existing trees split on its scaled values
+        base_model = joblib.load(os.path.join(model_dir, f"model_{target_zones[0]}.pkl"))
+        scaler = joblib.load(os.path.join(model_dir, f"scaler_{target_zones[0]}.pkl"))
+        X_scaled = scaler.transform(X)
 
-    # Each model gets its own scaler
-    scaler = MinMaxScaler()
-    X_scaled = scaler.fit_transform(X)
+        model = xgb.XGBRegressor(**{**base_model.get_params(), "n_estimators": continue_rounds, "n_jobs": n_jobs})
+        model.fit(X_scaled, y, xgb_model=base_model.get_booster())
+    else:
+        # Each model gets its own scaler
+        scaler = MinMaxScaler()
+        X_scaled = scaler.fit_transform(X)
 
-    model = xgb.XGBRegressor(
-        n_estimators=500,
-        learning_rate=0.05,
-        max_depth=8,
-        random_state=42,
-        n_jobs=-1,
-        reg_alpha=0.1 # Add a small regularization term
-    )
-    model.fit(X_scaled, y)
+        model = build_regressor(params or {}, n_jobs)
+        model.fit(X_scaled, y)
 
     # Save the model and its corresponding scaler
-    joblib.dump(model, os.path.join(output_dir, f"model_{zone}.pkl"))
-    joblib.dump(scaler, os.path.join(output_dir, f"scaler_{zone}.pkl"))
-    print(f"✅ Saved model and scaler for zone: {zone}")
+    for zone in target_zones:
+        joblib.dump(model, os.path.join(model_dir, f"model_{zone}.pkl"))
+        joblib.dump(scaler, os.path.join(model_dir, f"scaler_{zone}.pkl"))
+        # Native booster and flattened trees for the serving path, which load without unpickling
+        export_booster(model, model_dir, zone)
+    return source, target_zones, len(X)
+
+
+def load_manifest():
+    """The manifest of the version being served (or of a flat models directory)."""
+    return read_manifest(resolve_model_dir(output_dir)[0])
+
+
+def publish(version, model_dir, manifest):
+    """
+    Record the manifest in the new version, make it current and drop old versions.
+    API workers watching the directory switch to it without a restart.
+    """
+    write_manifest(model_dir, {**manifest, "version": version})
+    publish_version(output_dir, version)
+    removed = prune_versions(output_dir, KEEP_VERSIONS)
+    print(f"📦 Published model version {version}" + (f" (removed {', '.join(removed)})" if removed else ""))
+
+
+def search_zone_params(partitions, plan, args, max_workers=None):
+    """
+    Cross-validated search of the booster settings for every source in the
+    plan, all on one process pool. Returns {source: best search result}.
+    """
+    if args.search == "grid":
+        candidates = parameter_grid(XGB_SEARCH_SPACE)
+    else:
+        candidates = sample_parameters(XGB_SEARCH_SPACE, args.n_iter)
+    best, report = {}, {}
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source in sorted(plan, key=lambda s: len(partitions[s]) if s in partitions else 0, reverse=True):
+            if source not in partitions:
+                continue
+            # Scaled the way train_zone scales it, once per zone for every candidate and fold
+            X = MinMaxScaler().fit_transform(partitions[source][features])
+            y = partitions[source]['magnitude'].to_numpy()
+            strata = quantile_strata(y, bins=max(2, min(10, len(y) // (args.folds * 2))))
+            results = search(build_regressor, candidates, X, y, strata=strata, n_splits=args.folds,
+                             scoring=SEARCH_SCORING, max_workers=workers, pool=pool, label=source)
+            best[source] = results[0]
+            report[source] = results
+    if args.report:
+        write_report(args.report, {"scoring": SEARCH_SCORING, "folds": args.folds, "sources": report})
+        print(f"Search report saved as '{args.report}'")
+    return best
+
+
+def train_all(df, model_dir, max_workers=None, plan=None, continue_rounds=None, params=None):
+    """
+    Partitions the data once by zone and fits the per-zone models in parallel.
+    Each fit gets a slice of the CPU budget (n_jobs) instead of -1, so XGBoost's
+    own threads do not oversubscribe the machine.
+    `params` maps sources to booster settings that override XGB_PARAMS.
+    Returns {source: rows trained on} for the fits that ran.
+    """
+    params = params or {}
+    partitions = dict(tuple(df.groupby('zone', sort=False)))
+    if plan is None:
+        plan = plan_training(partitions)
+    # Only sources with data can be (re)trained
+    plan = {source: zones for source, zones in plan.items() if source in partitions}
+    if not plan:
+        return {}
+
+    # Largest partitions first, each given a share of the cores proportional to its size
+    sources = sorted(plan, key=lambda source: len(partitions[source]), reverse=True)
+    total_rows = sum(len(partitions[source]) for source in sources)
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(len(plan), max_workers or cpus))
+    threads = {source: max(1, round(cpus * len(partitions[source]) / total_rows)) for source in sources}
+    print(f"Fitting {len(plan)} model(s) on {workers} process(es) with {cpus} core(s) shared between them")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(train_zone, source, plan[source],
+                        partitions[source][features], partitions[source]['magnitude'], threads[source],
+                        model_dir, continue_rounds, params.get(source))
+            for source in sources
+        ]
+        trained = {}
+        for future in futures:
+            source, target_zones, n = future.result()
+            trained[source] = n
+            print(f"✅ Saved model and scaler for zone(s): {', '.join(target_zones)} (trained on '{source}', {n} samples)")
+
+    # Save the list of features for the API to use
+    joblib.dump(features, os.path.join(model_dir, "features.pkl"))
+    # ...and every zone's scaler parameters with it, in one memory-mappable file
+    scalers = {
+        zone: joblib.load(os.path.join(model_dir, f"scaler_{zone}.pkl"))
+        for zone in all_possible_zones if os.path.exists(os.path.join(model_dir, f"scaler_{zone}.pkl"))
+    }
+    write_preprocessing(os.path.join(model_dir, PREPROCESSING_NAME), features, scalers)
+    return trained
+
+
+def full_training(df, max_workers=None, search_args=None):
+    """
+    Trains every zone from scratch and records a manifest with per-source
+    watermarks. With `search_args`, each zone's booster settings are chosen by
+    cross-validated search first and recorded with their CV score.
+    """
+    partitions = dict(tuple(df.groupby('zone', sort=False)))
+    plan = plan_training(partitions)
+    tuned = search_zone_params(partitions, plan, search_args, max_workers) if search_args else {}
+    params = {source: result["params"] for source, result in tuned.items()}
+    version, model_dir = create_version(output_dir)
+    trained = train_all(df, model_dir, max_workers, plan=plan, params=params)
+    sources = {
+        source: {
+            "zones": plan[source], "rows": trained[source], "watermark": partitions[source]['time'].max().isoformat(),
+            "rounds": {**XGB_PARAMS, **params.get(source, {})}["n_estimators"], "params": params.get(source, {}),
+        }
+        for source in trained
+    }
+    for source, result in tuned.items():
+        if source in sources:
+            sources[source]["cv"] = {"scoring": SEARCH_SCORING, "mean": result["mean_score"], "std": result["std_score"]}
+    publish(version, model_dir, {"trained_at": datetime.now().isoformat(timespec="seconds"), "mode": "full", "sources": sources})
+
+
+def incremental_training(max_workers=None, rounds=100, min_new_rows=20):
+    """
+    Adds `rounds` boosting rounds to each existing zone model using only the
+    events newer than that model's watermark. Sources with fewer than
+    `min_new_rows` new events are left alone and keep their watermark, so
+    their new events count towards the next run.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        print("⚠️ No manifest found; running a full training instead.")
+        df = add_features(load_dataset())
+        full_training(df, max_workers)
+        return
+
+    sources = manifest["sources"]
+    oldest = min(pd.Timestamp(s["watermark"]) for s in sources.values())
+    # Start on a month boundary so the download reuses the cached month windows
+    df = add_features(load_dataset(oldest.strftime("%Y-%m-01")))
+
+    pending = {}
+    for source, info in sources.items():
+        new_rows = df[(df['zone'] == source) & (df['time'] > pd.Timestamp(info["watermark"]))]
+        if len(new_rows) < min_new_rows:
+            print(f"⏭️ '{source}': {len(new_rows)} new events since {info['watermark']}, skipping.")
+            continue
+        pending[source] = new_rows
+    if not pending:
+        print("Nothing to update.")
+        return
+
+    new_df = pd.concat(pending.values())
+    # The new version starts as a copy of the served one; untouched zones carry over as they are
+    version, model_dir = create_version(output_dir, base_dir=resolve_model_dir(output_dir)[0])
+    trained = train_all(new_df, model_dir, max_workers, plan={s: sources[s]["zones"] for s in pending}, continue_rounds=rounds)
+    for source, n in trained.items():
+        info = sources[source]
+        info["rows"] += n
+        info["rounds"] += rounds
+        info["watermark"] = pending[source]['time'].max().isoformat()
+    manifest.update(trained_at=datetime.now().isoformat(timespec="seconds"), mode="incremental", base_version=manifest.get("version"))
+    publish(version, model_dir, manifest)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the per-zone magnitude models.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Continue the existing models on events newer than their manifest watermark")
+    parser.add_argument("--rounds", type=int, default=100, help="Boosting rounds to add per model in incremental mode")
+    parser.add_argument("--min-new-rows", type=int, default=20, help="Minimum new events before a model is updated")
+    parser.add_argument("--search", choices=["grid", "random"],
+                        help="Pick each zone's booster settings by cross-validated search before training")
+    parser.add_argument("--n-iter", type=int, default=20, help="Candidates sampled per zone in random search")
+    parser.add_argument("--folds", type=int, default=5, help="Stratified folds per candidate")
+    parser.add_argument("--report", help="Write every candidate's scores, timings and memory to this JSON file")
+    args = parser.parse_args()
+    max_workers = os.getenv("TRAIN_WORKERS")
+    max_workers = int(max_workers) if max_workers else None
+
+    if args.incremental:
+        print("--- Incremental update of the specialized models ---")
+        try:
+            incremental_training(max_workers, args.rounds, args.min_new_rows)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ ERROR: Failed to download data. {e}")
+            exit()
+        exit()
+
+    print("--- Starting Specialized, Multi-Model Training Pipeline ---")
+
+    # --- 1. Data Fetching and Cleaning ---
+    try:
+        df = load_dataset()
+    except requests.exceptions.RequestException as e:
+        print(f"❌ ERROR: Failed to download data. {e}")
+        print("Could not fetch data. Exiting.")
+        exit()
+    print(f"\n✅ Dataset shape: {df.shape}")
+
+    # --- 2. Feature Engineering ---
+    print("\n🚀 Starting Feature Engineering...")
+    df = add_features(df)
+    print("✅ Feature engineering complete.")
 
-# Save the list of features for the API to use
-joblib.dump(features, os.path.join(output_dir, "features.pkl"))
+    # --- 3. Train and Save a Model for Each Zone ---
+    print("\n🎯 Training specialized models for each geographic zone...")
+    full_training(df, max_workers, search_args=args if args.search else None)
 
-print("\n🎉 --- All specialized models trained and saved successfully! --- 🎉")
+    print("\n🎉 --- All specialized models trained and saved successfully! --- 🎉")
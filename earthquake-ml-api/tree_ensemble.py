@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+# -------------------------------
+# Pure-NumPy tree-ensemble evaluator
+# -------------------------------
+# A trained XGBoost regressor is flattened into contiguous node arrays:
+#   feature[i], threshold[i]   split test: go left when x[feature] < threshold
+#   left[i], right[i]          absolute child indices (leaves point to themselves)
+#   default_left[i]            direction taken when the feature is missing (NaN)
+#   value[i]                   leaf value (already scaled by the learning rate)
+#   roots[t]                   index of tree t's root node
+# Because leaves are self-loops, a batch is evaluated by advancing every
+# (row, tree) cursor `max_depth` times with vectorized gathers, then summing
+# the leaf values. Serving a model this way needs only NumPy.
+
+CHUNK_ROWS = 256  # keeps the (rows × trees) cursor matrix cache-sized
+
+
+def flatten_booster(model) -> dict:
+    """
+    Convert an xgboost Booster / XGBRegressor (or its JSON dump as bytes/str)
+    into the flat arrays described above.
+    """
+    if hasattr(model, "get_booster"):
+        model = model.get_booster()
+    raw = model.save_raw(raw_format="json") if hasattr(model, "save_raw") else model
+    learner = json.loads(raw)["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective not in ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"):
+        raise ValueError(f"Unsupported objective for the NumPy evaluator: {objective}")
+    booster = learner["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"Unsupported booster: {booster['name']}")
+    params = learner["learner_model_param"]
+    if int(params.get("num_target", "1")) != 1 or int(params.get("num_class", "0")) > 1:
+        raise ValueError("Only single-output regressors are supported")
+
+    trees = booster["model"]["trees"]
+    sizes = [len(tree["left_children"]) for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+    total = int(sum(sizes))
+
+    feature = np.zeros(total, dtype=np.int32)
+    threshold = np.zeros(total, dtype=np.float32)
+    left = np.arange(total, dtype=np.int32)
+    right = np.arange(total, dtype=np.int32)
+    default_left = np.zeros(total, dtype=bool)
+    value = np.zeros(total, dtype=np.float32)
+    max_depth = 0
+
+    for tree, offset, size in zip(trees, offsets, sizes):
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits are not supported")
+        span = slice(offset, offset + size)
+        lc = np.asarray(tree["left_children"], dtype=np.int32)
+        rc = np.asarray(tree["right_children"], dtype=np.int32)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = lc == -1
+
+        feature[span] = np.where(is_leaf, 0, tree["split_indices"])
+        threshold[span] = np.where(is_leaf, 0.0, cond)
+        left[span] = np.where(is_leaf, np.arange(size) + offset, lc + offset)
+        right[span] = np.where(is_leaf, np.arange(size) + offset, rc + offset)
+        default_left[span] = np.asarray(tree["default_left"], dtype=bool)
+        value[span] = np.where(is_leaf, cond, 0.0)
+
+        depth = np.zeros(size, dtype=np.int32)
+        for node in range(size):  # children always have larger ids than parents
+            if not is_leaf[node]:
+                depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+    base_score = float(str(params["base_score"]).strip("[]"))
+    return {
+        "feature": feature,
+        "threshold": threshold,
+        "left": left,
+        "right": right,
+        "default_left": default_left,
+        "value": value,
+        "roots": offsets,
+        "base_score": np.float64(base_score),
+        "max_depth": np.int32(max_depth),
+        "num_feature": np.int32(int(params["num_feature"])),
+    }
+
+
+def save_ensemble(path: str, arrays: dict) -> None:
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+class TreeEnsemble:
+    def __init__(self, arrays):
+        self.feature = np.asarray(arrays["feature"], dtype=np.intp)
+        self.threshold = np.ascontiguousarray(arrays["threshold"], dtype=np.float32)
+        self.default_left = np.ascontiguousarray(arrays["default_left"], dtype=bool)
+        self.value = np.ascontiguousarray(arrays["value"], dtype=np.float32)
+        self.roots = np.asarray(arrays["roots"], dtype=np.intp)
+        self.base_score = float(arrays["base_score"])
+        self.max_depth = int(arrays["max_depth"])
+        self.num_feature = int(arrays["num_feature"])
+        # Interleaved [left, right] pairs: the next node is children[2 * node + went_right]
+        self.children = np.stack([arrays["left"], arrays["right"]], axis=1).ravel().astype(np.intp)
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict(self, X) -> np.ndarray:
+        # XGBoost compares features in float32, so do the same
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.num_feature:
+            raise ValueError(f"Expected a 2-D array with {self.num_feature} columns, got shape {X.shape}")
+        has_missing = bool(np.isnan(X).any())
+        out = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), CHUNK_ROWS):
+            out[start:start + CHUNK_ROWS] = self._predict_chunk(X[start:start + CHUNK_ROWS], has_missing)
+        return out
+
+    def _predict_chunk(self, X, has_missing) -> np.ndarray:
+        flat = X.ravel()
+        row_offset = (np.arange(len(X), dtype=np.intp) * self.num_feature)[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[node]]
+            went_right = ~(x < self.threshold[node])
+            if has_missing:
+                went_right &= ~(np.isnan(x) & self.default_left[node])
+            node = self.children[2 * node + went_right]
+        return self.value[node].sum(axis=1, dtype=np.float64) + self.base_score
+
+
+def benchmark(model_dir: str, batch_sizes=(1, 64, 1024, 16384), repeats: int = 20) -> list:
+    """
+    Compare TreeEnsemble with XGBRegressor.predict for every pickled zone model:
+    maximum absolute difference and mean time per call.
+    """
+    import joblib
+    import warnings
+
+    results = []
+    rng = np.random.default_rng(0)
+    for name in sorted(os.listdir(model_dir)):
+        if not (name.startswith("model_") and name.endswith(".pkl")):
+            continue
+        zone = name[len("model_"):-len(".pkl")]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reference = joblib.load(os.path.join(model_dir, name))
+        ensemble = TreeEnsemble(flatten_booster(reference))
+        for n in batch_sizes:
+            X = rng.uniform(-0.2, 1.2, size=(n, ensemble.num_feature))
+            X[rng.random(X.shape) < 0.01] = np.nan
+            timings = {}
+            for label, fn in (("xgboost", reference.predict), ("numpy", ensemble.predict)):
+                fn(X)  # warm-up
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    prediction = fn(X)
+                timings[label] = (time.perf_counter() - start) / repeats
+                if label == "xgboost":
+                    expected = prediction
+            diff = float(np.max(np.abs(prediction - expected)))
+            results.append({"zone": zone, "rows": n, "max_abs_diff": diff,
+                            "xgboost_ms": timings["xgboost"] * 1e3, "numpy_ms": timings["numpy"] * 1e3})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flatten zone models for the NumPy evaluator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("convert", help="Write model_<zone>.trees.npz next to each model").add_argument("model_dir", nargs="?", default="models")
+    sub.add_parser("benchmark", help="Compare against XGBRegressor.predict").add_argument("model_dir", nargs="?", default="models")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        from model_artifacts import export_model_dir
+        print(f"✅ Exported {export_model_dir(args.model_dir)}")
+    else:
+        for row in benchmark(args.model_dir):
+            print(f"{row['zone']:<20} rows={row['rows']:>6}  max|Δ|={row['max_abs_diff']:.2e}  "
+                  f"xgboost={row['xgboost_ms']:8.3f} ms  numpy={row['numpy_ms']:8.3f} ms")
@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+
+# -------------------------------
+# Windowed, resumable USGS catalogue download
+# -------------------------------
+# The FDSN event service caps a query at 20,000 events, so the time range is
+# split into calendar-month windows. Any window that hits the cap is halved
+# until every piece fits. Each window is requested as CSV, streamed straight
+# into pandas columns, and written to its own Parquet file under the cache
+# directory; the raw response is never buffered whole. While downloading,
+# each worker holds the window it is fetching, plus the recent (uncached)
+# windows kept for the result. The result itself is every window read back
+# and concatenated into one DataFrame, because training needs all of it at
+# once, so peak memory is the full event table.
+#
+# A window is only cached once it ends more than SETTLE_DAYS ago, because USGS
+# keeps revising recent events. Later runs skip cached windows and download
+# only the recent or missing ones.
+
+USGS_API_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+FDSN_LIMIT = 20000
+SETTLE_DAYS = 7
+MIN_WINDOW = timedelta(hours=1)
+COLUMNS = ["time", "latitude", "longitude", "depth", "magnitude", "id"]
+
+
+def month_windows(start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Split [start, end) into windows aligned to calendar months, so that window
+    boundaries (and therefore cache file names) are the same on every run.
+    """
+    windows = []
+    cursor = start
+    while cursor < end:
+        next_month = (cursor.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        windows.append((cursor, min(next_month, end)))
+        cursor = next_month
+    return windows
+
+
+def _fmt(when: datetime) -> str:
+    return when.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def fetch_window(session, start: datetime, end: datetime, min_magnitude: float, url: str = USGS_API_URL) -> pd.DataFrame:
+    """
+    Download one window as CSV and parse it into columns. If the response is
+    truncated at the FDSN limit the window is split in two and fetched again.
+    """
+    params = {
+        "format": "csv",
+        "starttime": _fmt(start),
+        "endtime": _fmt(end),
+        "minmagnitude": min_magnitude,
+        "limit": FDSN_LIMIT,
+        "orderby": "time-asc",
+    }
+    with session.get(url, params=params, stream=True, timeout=(10, 300)) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        df = pd.read_csv(
+            response.raw,
+            usecols=["time", "latitude", "longitude", "depth", "mag", "id"],
+            dtype={"latitude": np.float64, "longitude": np.float64, "depth": np.float64, "mag": np.float64, "id": str},
+        )
+
+    if len(df) >= FDSN_LIMIT and end - start > MIN_WINDOW:
+        middle = start + (end - start) / 2
+        return pd.concat(
+            [fetch_window(session, start, middle, min_magnitude, url), fetch_window(session, middle, end, min_magnitude, url)],
+            ignore_index=True,
+        )
+
+    df = df.rename(columns={"mag": "magnitude"})
+    # Same representation as before: naive UTC timestamps
+    df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce", format="ISO8601").dt.tz_localize(None)
+    return df[COLUMNS]
+
+
+def _cache_path(cache_dir: str, min_magnitude: float, start: datetime, end: datetime) -> str:
+    partition = os.path.join(cache_dir, f"minmag={min_magnitude}", f"year={start.year}")
+    return os.path.join(partition, f"{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.parquet")
+
+
+def download_events(
+    start_time: str,
+    end_time: str,
+    min_magnitude: float,
+    cache_dir: str = "usgs_cache",
+    max_workers: int = 4,
+    url: str = USGS_API_URL,
+) -> pd.DataFrame:
+    """
+    Fetch every event in [start_time, end_time) with magnitude >= min_magnitude,
+    downloading only the windows that are not already in `cache_dir`.
+    Returns a DataFrame with time, latitude, longitude, depth, magnitude, id.
+    """
+    start, end = pd.Timestamp(start_time).to_pydatetime(), pd.Timestamp(end_time).to_pydatetime()
+    settled_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=SETTLE_DAYS)
+
+    windows = month_windows(start, end)
+    cached = [w for w in windows if w[1] <= settled_before and os.path.exists(_cache_path(cache_dir, min_magnitude, *w))]
+    missing = [w for w in windows if w not in cached]
+    print(f"{len(windows)} windows: {len(cached)} cached, {len(missing)} to download")
+
+    fresh = []  # recent, unsettled windows: kept in memory only
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_window, session, w_start, w_end, min_magnitude, url): (w_start, w_end)
+                   for w_start, w_end in missing}
+        for future in as_completed(futures):
+            w_start, w_end = futures[future]
+            df = future.result()
+            if w_end <= settled_before:
+                path = _cache_path(cache_dir, min_magnitude, w_start, w_end)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                df.to_parquet(path + ".tmp", index=False)
+                os.replace(path + ".tmp", path)  # a window is either fully cached or absent
+            else:
+                fresh.append(df)
+            print(f"  {w_start:%Y-%m-%d} → {w_end:%Y-%m-%d}: {len(df)} events")
+
+    settled_paths = [_cache_path(cache_dir, min_magnitude, *w) for w in windows if w[1] <= settled_before]
+    frames = [pd.read_parquet(path) for path in settled_paths] + fresh
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    events = pd.concat(frames, ignore_index=True)
+    # Adjacent windows share their boundary instant
+    return events.drop_duplicates(subset="id", ignore_index=True)
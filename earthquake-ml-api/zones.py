@@ -0,0 +1,37 @@
+import numpy as np
+
+# -------------------------------
+# Seismic risk zones
+# -------------------------------
+# Shared by the API and the training scripts so every model is routed with the
+# same rectangles. Zones are checked in order and the first match wins.
+
+# (zone, min lat, max lat, min lon, max lon), all bounds inclusive
+ZONE_BOUNDS = [
+    ('himalayan_belt', 28, 36, 73, 88),       # Zone 1: Himalayan Belt (High Risk)
+    ('andaman_nicobar', 6, 14, 92, 94),       # Zone 2: Andaman & Nicobar Islands (High Risk)
+    ('kutch_region', 22, 24, 68, 72),         # Zone 3: Kutch Region, Gujarat (High Risk)
+    ('indo_gangetic_plain', 24, 30, 75, 88),  # Zone 4: Indo-Gangetic Plain (Medium Risk)
+    ('peninsular_india', 8, 22, 72, 85),      # Zone 5: Peninsular India (Low Risk)
+]
+ZONES = [zone for zone, *_ in ZONE_BOUNDS] + ['other']
+
+
+def get_risk_zone(lat, lon):
+    for zone, lat_min, lat_max, lon_min, lon_max in ZONE_BOUNDS:
+        if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max:
+            return zone
+    return 'other'
+
+
+def assign_zones(lat, lon) -> np.ndarray:
+    """
+    Vectorized get_risk_zone: one boolean mask per zone, first match wins.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    masks = [
+        (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        for _, lat_min, lat_max, lon_min, lon_max in ZONE_BOUNDS
+    ]
+    return np.select(masks, [zone for zone, *_ in ZONE_BOUNDS], default='other').astype(object)
@@ -1,7 +1,16 @@
-import React, { useEffect, useRef } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { MapContainer, TileLayer, CircleMarker, Popup, useMap } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 
+// Precomputed global risk grid served as map tiles by the FastAPI service
+const RISK_TILES_URL =
+  process.env.REACT_APP_RISK_TILES_URL || 'http://localhost:8000/risk-grid/{z}/{x}/{y}';
+
+// Server-Sent Events stream of new earthquakes near a point, from the FastAPI service
+const LIVE_EVENTS_URL =
+  process.env.REACT_APP_LIVE_EVENTS_URL || 'http://localhost:8000/events/stream';
+const LIVE_EVENTS_RADIUS_KM = 500;
+
 // A helper component to programmatically update the map view
 const MapUpdater = ({ center, zoom }) => {
   const map = useMap();
@@ -13,6 +22,20 @@ const MapUpdater = ({ center, zoom }) => {
 
 const RiskMap = ({ latitude, longitude, magnitude, risk }) => {
   const position = [latitude, longitude];
+  const [liveEvents, setLiveEvents] = useState([]);
+
+  // New quakes around the predicted location are pushed by the server; no polling
+  useEffect(() => {
+    setLiveEvents([]);
+    const source = new EventSource(
+      `${LIVE_EVENTS_URL}?latitude=${latitude}&longitude=${longitude}&radius_km=${LIVE_EVENTS_RADIUS_KM}`
+    );
+    source.addEventListener('earthquake', (e) => {
+      const quake = JSON.parse(e.data);
+      setLiveEvents((prev) => [quake, ...prev.filter((q) => q.id !== quake.id)].slice(0, 50));
+    });
+    return () => source.close();
+  }, [latitude, longitude]);
 
   // Helper function to get color based on risk
   const getRiskColor = (riskLevel) => {
@@ -52,6 +75,9 @@ const RiskMap = ({ latitude, longitude, magnitude, risk }) => {
           attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
           url="https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png"
         />
+
+        {/* Risk overlay: one cached tile per view instead of a prediction per point */}
+        <TileLayer url={RISK_TILES_URL} opacity={0.45} maxNativeZoom={12} />
         
         {/* This component handles map view changes when props update */}
         <MapUpdater center={position} zoom={7} />
@@ -69,6 +95,22 @@ const RiskMap = ({ latitude, longitude, magnitude, risk }) => {
             </div>
           </Popup>
         </CircleMarker>
+
+        {liveEvents.map((quake) => (
+          <CircleMarker
+            key={quake.id}
+            center={[quake.latitude, quake.longitude]}
+            pathOptions={{ radius: 4 + (quake.magnitude || 0), color: '#fff', weight: 1, fillColor: '#9b59b6', fillOpacity: 0.7 }}
+          >
+            <Popup>
+              <div>
+                <h4>Live: M {quake.magnitude ?? '?'}</h4>
+                <p>{quake.place}</p>
+                <p>{new Date(quake.time).toLocaleString()} · {quake.distance_km} km away</p>
+              </div>
+            </Popup>
+          </CircleMarker>
+        ))}
       </MapContainer>
     </div>
   );